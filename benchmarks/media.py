@@ -0,0 +1,250 @@
+"""Generated test media and a local range-capable HTTP server for the benchmarks.
+
+Fixtures are made with ffmpeg's lavfi sources and mimic what YouTube
+serves: a pre-muxed 360p MP4 (format 18), separate 720p video and AAC
+audio streams (formats 136 and 140), and for one video only a real DASH
+manifest with segments, which yt-dlp downloads fragment by fragment.
+
+Any other ID starting with 'bench' is served as a copy of the first
+progressive video under its own ID and title, so batch benchmarks can
+download many distinct videos.
+"""
+
+import json
+import os
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Video IDs must look like YouTube IDs (11 characters) to pass URL parsing
+PROGRESSIVE_IDS = ('benchVid001', 'benchVid002')
+DASH_ID = 'benchDash01'
+
+READ_SIZE = 64 * 1024
+
+def _ffmpeg(args):
+    cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y'] + args
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.strip()}")
+
+def _sources(duration, size, rate=30):
+    return [
+        '-f', 'lavfi', '-i', f"testsrc2=size={size}:rate={rate}:duration={duration}",
+        '-f', 'lavfi', '-i', f"sine=frequency=440:sample_rate=44100:duration={duration}",
+    ]
+
+# Two-second GOPs, like YouTube's streams
+_VIDEO_ARGS = ['-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p', '-g', '60',
+               '-keyint_min', '60', '-sc_threshold', '0']
+_AUDIO_ARGS = ['-c:a', 'aac', '-b:a', '128k']
+
+def generate_fixtures(folder, duration=60):
+    """Create the fixture media in folder (skipped if already there); return the manifest."""
+    manifest_path = os.path.join(folder, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('duration') == duration:
+            return manifest
+
+    videos = {}
+    for video_id in PROGRESSIVE_IDS:
+        video_dir = os.path.join(folder, video_id)
+        os.makedirs(video_dir, exist_ok=True)
+        _ffmpeg(_sources(duration, '640x360') + ['-map', '0:v', '-map', '1:a'] + _VIDEO_ARGS + _AUDIO_ARGS +
+                ['-movflags', '+faststart', os.path.join(video_dir, '18.mp4')])
+        _ffmpeg(_sources(duration, '1280x720') + ['-map', '0:v', '-an'] + _VIDEO_ARGS +
+                ['-movflags', '+faststart', os.path.join(video_dir, '136.mp4')])
+        _ffmpeg(_sources(duration, '640x360') + ['-map', '1:a', '-vn'] + _AUDIO_ARGS +
+                ['-movflags', '+faststart', os.path.join(video_dir, '140.m4a')])
+        videos[video_id] = {
+            'formats': [
+                {'format_id': '18', 'file': '18.mp4', 'ext': 'mp4', 'vcodec': 'avc1.64001e',
+                 'acodec': 'mp4a.40.2', 'width': 640, 'height': 360, 'fps': 30},
+                {'format_id': '136', 'file': '136.mp4', 'ext': 'mp4', 'vcodec': 'avc1.64001f',
+                 'acodec': 'none', 'width': 1280, 'height': 720, 'fps': 30},
+                {'format_id': '140', 'file': '140.m4a', 'ext': 'm4a', 'vcodec': 'none',
+                 'acodec': 'mp4a.40.2', 'abr': 128},
+            ],
+        }
+
+    dash_dir = os.path.join(folder, DASH_ID)
+    os.makedirs(dash_dir, exist_ok=True)
+    _ffmpeg(_sources(duration, '1280x720') + ['-map', '0:v', '-map', '1:a'] + _VIDEO_ARGS + _AUDIO_ARGS +
+            ['-f', 'dash', '-seg_duration', '4', '-use_template', '1', '-use_timeline', '0',
+             os.path.join(dash_dir, 'manifest.mpd')])
+    videos[DASH_ID] = {'mpd': 'manifest.mpd'}
+
+    for video_id, video in videos.items():
+        for fmt in video.get('formats', []):
+            fmt['filesize'] = os.path.getsize(os.path.join(folder, video_id, fmt['file']))
+            fmt['tbr'] = round(fmt['filesize'] * 8 / 1000 / duration, 1)
+
+    manifest = {'duration': duration, 'videos': videos}
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def info_dict(manifest, video_id, base_url):
+    """The info dict the stub extractor returns for one fixture video (or an alias of one)."""
+    source_id = video_id if video_id in manifest['videos'] else PROGRESSIVE_IDS[0]
+    video = manifest['videos'][source_id]
+    info = {
+        'id': video_id,
+        'title': f"Benchmark video {video_id}",
+        'duration': manifest['duration'],
+        'uploader': "benchmarks",
+    }
+    if 'mpd' in video:
+        info['mpd_url'] = f"{base_url}/{source_id}/{video['mpd']}"
+    else:
+        info['formats'] = [
+            dict({k: v for k, v in fmt.items() if k != 'file'}, url=f"{base_url}/{source_id}/{fmt['file']}")
+            for fmt in video['formats']
+        ]
+    return info
+
+class MediaHandler(BaseHTTPRequestHandler):
+    """Serves fixture files with single byte-range support, plus /<id>/info.json.
+
+    With the server's fail_every set, every Nth response body longer than
+    one read is cut off halfway and the connection dropped.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_body(self, body, content_type='application/json'):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.server.count(len(body))
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split('?', 1)[0].lstrip('/')
+        if server.latency:
+            time.sleep(server.latency)
+
+        video_id, _, name = path.partition('/')
+        if name == 'info.json' and video_id.startswith('bench'):
+            body = json.dumps(info_dict(server.manifest, video_id, server.base_url)).encode('utf-8')
+            self._send_body(body)
+            return
+
+        file_path = os.path.realpath(os.path.join(server.folder, path))
+        if not file_path.startswith(server.folder + os.sep) or not os.path.isfile(file_path):
+            self.send_error(404)
+            return
+
+        size = os.path.getsize(file_path)
+        start, end = 0, size - 1
+        range_header = self.headers.get('Range')
+        if range_header and range_header.startswith('bytes='):
+            first, _, last = range_header[6:].split(',')[0].partition('-')
+            try:
+                if first:
+                    start = int(first)
+                    end = min(int(last), size - 1) if last else size - 1
+                else:
+                    start = max(size - int(last), 0)
+            except ValueError:
+                self.send_error(416)
+                return
+            if start > end or start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{size}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        if self.command == 'HEAD':
+            return
+
+        remaining = end - start + 1
+        if remaining > READ_SIZE and server.inject_failure():
+            remaining //= 2
+            self.close_connection = True
+        started = time.monotonic()
+        sent = 0
+        try:
+            with open(file_path, 'rb') as f:
+                f.seek(start)
+                while remaining > 0:
+                    data = f.read(min(READ_SIZE, remaining))
+                    if not data:
+                        break
+                    self.wfile.write(data)
+                    server.count(len(data))
+                    remaining -= len(data)
+                    sent += len(data)
+                    if server.rate:
+                        # Per-connection bandwidth limit, like a real CDN
+                        delay = sent / server.rate - (time.monotonic() - started)
+                        if delay > 0:
+                            time.sleep(delay)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+class MediaServer(ThreadingHTTPServer):
+    """Local media server; bytes_sent counts every body byte written."""
+
+    daemon_threads = True
+
+    def __init__(self, folder, manifest, host='127.0.0.1', port=0, rate=0, latency=0, fail_every=0):
+        super().__init__((host, port), MediaHandler)
+        self.folder = os.path.realpath(folder)
+        self.manifest = manifest
+        self.rate = rate
+        self.latency = latency
+        self.fail_every = fail_every
+        self.bytes_sent = 0
+        self.requests = 0
+        self.failures = 0
+        self._bodies = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def count(self, num_bytes):
+        with self._lock:
+            self.bytes_sent += num_bytes
+
+    def inject_failure(self):
+        """Count one media body; True if this one should be cut off."""
+        with self._lock:
+            if not self.fail_every:
+                return False
+            self._bodies += 1
+            if self._bodies % self.fail_every:
+                return False
+            self.failures += 1
+            return True
+
+    def process_request(self, request, client_address):
+        with self._lock:
+            self.requests += 1
+        super().process_request(request, client_address)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="media-server", daemon=True).start()
+        return self
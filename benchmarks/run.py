@@ -0,0 +1,543 @@
+"""Offline benchmarks for the downloader, against generated media on a local server.
+
+    python benchmarks/run.py                          # all scenarios
+    python benchmarks/run.py --scenarios info_cold,trim_fast --iterations 10
+    python benchmarks/run.py --save-baseline          # record benchmarks/baseline.json
+    python benchmarks/run.py --threshold 0.2          # fail if >20% worse than the baseline
+
+Nothing touches YouTube: a stub yt-dlp extractor (yt_dlp_plugins/) answers
+the benchmark video IDs from the local media server (media.py). Each
+scenario runs in its own process with an empty cache folder, so peak RSS
+and the caches are per scenario. Reported per scenario: operations,
+p50/p99/mean latency, ops/s, output MB/s, bytes on the wire (as counted by
+the media server) and peak RSS.
+
+reencode and reencode_parallel time the whole-clip re-encode fallback in
+one ffmpeg run and in parallel chunks; resume fetches a stream while the
+server cuts off every few responses; batch_1/2/4 run a batch of distinct
+videos with 1, 2 and 4 workers (each operation is one batch, so compare
+their MB/s; add --rate to see how the worker count pays off against a
+bandwidth-limited server).
+
+Needs ffmpeg; scenarios that trim or extract audio also need ffprobe and
+are skipped without it.
+"""
+
+import argparse
+import functools
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(1, os.path.dirname(BENCH_DIR))
+
+from media import DASH_ID, PROGRESSIVE_IDS, MediaServer, generate_fixtures  # noqa: E402
+
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+# Compared against the baseline: metric -> True if higher is worse
+COMPARED_METRICS = {
+    'p50': True,
+    'p99': True,
+    'ops_per_s': False,
+    'bytes_on_wire': True,
+    'peak_rss_mb': True,
+}
+# Latency differences below this many seconds are timer noise, not regressions
+LATENCY_NOISE = 0.002
+
+# Server fault injection per scenario: cut off every Nth media response
+SERVER_FAULTS = {'resume': 4}
+# Videos per batch in the batch_* scenarios
+BATCH_SIZE = 8
+
+def _url(video_id):
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+# --- Scenarios (run in the child process) ---
+
+def _reset_caches():
+    """Forget every cache: the on-disk folders and the process-wide instances."""
+    from ytdownloader import cache
+    from ytdownloader.utils import get_cache_folder
+
+    with cache._shared_lock:
+        cache._shared.clear()
+    shutil.rmtree(get_cache_folder(), ignore_errors=True)
+
+def _clear_info_cache():
+    from ytdownloader.cache import get_info_cache
+
+    folder = get_info_cache().folder
+    for name in os.listdir(folder):
+        os.remove(os.path.join(folder, name))
+
+def _output_size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path)
+
+class Runner:
+    """Times operations; setup work between operations is not counted."""
+
+    def __init__(self, args, workdir):
+        self.args = args
+        self.workdir = workdir
+        self.latencies = []
+        self.output_bytes = 0
+        self.errors = []
+        # Scenario-specific counters, reported alongside the summary
+        self.extra = {}
+        self._lock = threading.Lock()
+        self._folders = 0
+
+    def output_folder(self):
+        with self._lock:
+            self._folders += 1
+            folder = os.path.join(self.workdir, f"out{self._folders}")
+        os.makedirs(folder)
+        return folder
+
+    def timed(self, op, *args, **kwargs):
+        """Run one operation returning (success, result, ...); record its latency and output size."""
+        started = time.perf_counter()
+        result = op(*args, **kwargs)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            if result[0]:
+                self.latencies.append(elapsed)
+                if isinstance(result[1], str) and os.path.exists(result[1]):
+                    self.output_bytes += _output_size(result[1])
+            else:
+                self.errors.append(str(result[1]))
+        return result
+
+    def repeat(self, op, setup=None):
+        for _ in range(self.args.iterations):
+            arguments = setup() if setup else ()
+            self.timed(op, *arguments)
+
+def scenario_info_cold(runner):
+    from ytdownloader import get_video_info
+
+    def setup():
+        _clear_info_cache()
+        return (_url(PROGRESSIVE_IDS[0]),)
+
+    # First call builds the pooled YoutubeDL; keep it out of the numbers
+    get_video_info(_url(PROGRESSIVE_IDS[0]))
+    runner.repeat(get_video_info, setup)
+
+def scenario_info_warm(runner):
+    from ytdownloader import get_video_info
+
+    get_video_info(_url(PROGRESSIVE_IDS[0]))
+    runner.repeat(get_video_info, lambda: (_url(PROGRESSIVE_IDS[0]),))
+
+def scenario_ydl_pool(runner):
+    # Same as info_cold; the reference point for ydl_fresh
+    scenario_info_cold(runner)
+
+def scenario_ydl_fresh(runner):
+    from ytdownloader import pool
+
+    # No idle instances kept: every lookup builds a new YoutubeDL
+    pool._pool = pool.YDLPool(max_idle=0)
+    scenario_info_cold(runner)
+
+def _download_setup(runner, video_id):
+    def setup():
+        _reset_caches()
+        return (_url(video_id), runner.output_folder())
+    return setup
+
+def scenario_full_download(runner):
+    from ytdownloader import download_video
+
+    runner.repeat(download_video, _download_setup(runner, PROGRESSIVE_IDS[0]))
+
+def scenario_audio(runner):
+    from ytdownloader import download_video
+
+    runner.repeat(lambda url, folder: download_video(url, folder, audio_only=True),
+                  _download_setup(runner, PROGRESSIVE_IDS[0]))
+
+def scenario_trim_fast(runner):
+    from ytdownloader import download_video
+
+    runner.repeat(lambda url, folder: download_video(url, folder, 20, 35),
+                  _download_setup(runner, PROGRESSIVE_IDS[0]))
+
+def scenario_trim_fallback(runner):
+    from ytdownloader import download_video
+
+    # Without range fetching the full source is downloaded, cached and trimmed
+    runner.repeat(lambda url, folder: download_video(url, folder, 20, 35, range_fetch=False),
+                  _download_setup(runner, PROGRESSIVE_IDS[0]))
+
+def _fixture(runner, video_id, name):
+    """Fetch one fixture file from the media server into the work folder (not timed)."""
+    from ytdownloader.fetch import fetch_url
+
+    path = os.path.join(runner.workdir, f"{video_id}-{name}")
+    if not os.path.exists(path):
+        fetch_url(f"{os.environ['YTDL_BENCH_SERVER']}/{video_id}/{name}", path)
+    return path
+
+def _reencode_op(runner, reencode):
+    source = _fixture(runner, PROGRESSIVE_IDS[0], '18.mp4')
+    duration = runner.args.media_duration
+
+    def op():
+        output_path = reencode(source, 5, duration - 5, os.path.join(runner.output_folder(), "clip.mp4"))
+        return (True, output_path) if output_path else (False, "re-encode failed")
+    runner.repeat(op)
+
+def scenario_reencode(runner):
+    from ytdownloader.trim import reencode
+
+    _reencode_op(runner, reencode)
+
+def scenario_reencode_parallel(runner):
+    from ytdownloader.trim import CHUNK_ENCODE_THREADS, available_cpus, parallel_reencode
+
+    # At least two chunks, so single-core machines measure the split too
+    workers = max(2, available_cpus() // CHUNK_ENCODE_THREADS)
+    runner.extra['workers'] = workers
+    _reencode_op(runner, functools.partial(parallel_reencode, workers=workers))
+
+def scenario_resume(runner):
+    """Fetch a stream while the server cuts off responses; each failure stops the fetch, which resumes.
+
+    Every finished file is checked against the fixture's SHA-256, so a
+    resume that loses or duplicates bytes counts as an error.
+    """
+    from ytdownloader.fetch import FetchError, fetch_url
+    from ytdownloader.utils import file_sha256
+
+    url = f"{os.environ['YTDL_BENCH_SERVER']}/{PROGRESSIVE_IDS[0]}/136.mp4"
+    expected = file_sha256(os.path.join(os.environ['YTDL_BENCH_FIXTURES'], PROGRESSIVE_IDS[0], '136.mp4'))
+    runner.extra['resumes'] = 0
+
+    def op():
+        output_path = os.path.join(runner.output_folder(), "136.mp4")
+        for _ in range(50):
+            try:
+                # One attempt per chunk, so every cut-off interrupts the whole fetch
+                fetch_url(url, output_path, chunk_size=512 * 1024, identity='resume', retries=1)
+            except FetchError:
+                runner.extra['resumes'] += 1
+                continue
+            if file_sha256(output_path) != expected:
+                return False, "resumed file differs from the fixture"
+            return True, output_path
+        return False, "fetch did not finish after 50 attempts"
+    runner.repeat(op)
+
+def _batch(runner, workers):
+    from ytdownloader import BatchDownloader
+
+    batches = iter(range(runner.args.iterations))
+
+    def setup():
+        _reset_caches()
+        # Fresh IDs for every batch; the server serves them all as the same video
+        first = next(batches) * BATCH_SIZE
+        return ([_url(f"benchB{n:05d}") for n in range(first, first + BATCH_SIZE)], runner.output_folder())
+
+    def op(urls, folder):
+        batch = BatchDownloader(folder, max_workers=workers)
+        for url in urls:
+            batch.submit(url)
+        failed = [item for item in batch.wait() if item['status'] != 'done']
+        if failed:
+            return False, f"{len(failed)} of {len(urls)} failed: {failed[0]['error']}"
+        return True, folder
+    runner.repeat(op, setup)
+
+def scenario_batch_1(runner):
+    _batch(runner, 1)
+
+def scenario_batch_2(runner):
+    _batch(runner, 2)
+
+def scenario_batch_4(runner):
+    _batch(runner, 4)
+
+def scenario_dash(runner):
+    from ytdownloader import download_video
+
+    runner.repeat(download_video, _download_setup(runner, DASH_ID))
+
+def scenario_concurrent(runner):
+    """Many users at once: mostly info lookups and clips, some full downloads, over two videos."""
+    from ytdownloader import download_video, get_video_info
+
+    _reset_caches()
+    duration = runner.args.media_duration
+
+    def user(seed):
+        rng = random.Random(seed)
+        for _ in range(runner.args.iterations):
+            url = _url(rng.choice(PROGRESSIVE_IDS))
+            roll = rng.random()
+            if roll < 0.4:
+                runner.timed(get_video_info, url)
+            elif roll < 0.9:
+                start = rng.randrange(0, duration - 10)
+                runner.timed(download_video, url, runner.output_folder(), start, start + rng.randint(3, 10))
+            else:
+                runner.timed(download_video, url, runner.output_folder())
+
+    threads = [threading.Thread(target=user, args=(runner.args.seed + i,)) for i in range(runner.args.users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+# name -> (function, needs ffprobe)
+SCENARIOS = {
+    'info_cold': (scenario_info_cold, False),
+    'info_warm': (scenario_info_warm, False),
+    'ydl_pool': (scenario_ydl_pool, False),
+    'ydl_fresh': (scenario_ydl_fresh, False),
+    'full_download': (scenario_full_download, False),
+    'audio': (scenario_audio, True),
+    'trim_fast': (scenario_trim_fast, False),
+    'trim_fallback': (scenario_trim_fallback, True),
+    'dash': (scenario_dash, False),
+    'concurrent': (scenario_concurrent, False),
+    'reencode': (scenario_reencode, False),
+    'reencode_parallel': (scenario_reencode_parallel, True),
+    'resume': (scenario_resume, False),
+    'batch_1': (scenario_batch_1, False),
+    'batch_2': (scenario_batch_2, False),
+    'batch_4': (scenario_batch_4, False),
+}
+
+def _peak_rss_mb(children=False):
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def run_child(args):
+    workdir = tempfile.mkdtemp(prefix=f"ytdl-bench-{args.child}-")
+    runner = Runner(args, workdir)
+    started = time.perf_counter()
+    try:
+        SCENARIOS[args.child][0](runner)
+    finally:
+        wall = time.perf_counter() - started
+        shutil.rmtree(workdir, ignore_errors=True)
+    result = {
+        'latencies': runner.latencies,
+        'errors': runner.errors,
+        'output_bytes': runner.output_bytes,
+        'extra': runner.extra,
+        'wall': wall,
+        'peak_rss_mb': _peak_rss_mb(),
+        'peak_rss_children_mb': _peak_rss_mb(children=True),
+    }
+    with open(args.result, 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+    return 0
+
+# --- Orchestration (parent process) ---
+
+def _percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+def summarize(raw, bytes_on_wire):
+    latencies = raw['latencies']
+    ops = len(latencies)
+    summary = {
+        'ops': ops,
+        'errors': len(raw['errors']),
+        'wall': round(raw['wall'], 3),
+        'bytes_on_wire': bytes_on_wire,
+        'output_bytes': raw['output_bytes'],
+        'peak_rss_mb': raw['peak_rss_mb'],
+        'peak_rss_children_mb': raw['peak_rss_children_mb'],
+    }
+    summary.update(raw.get('extra') or {})
+    if ops:
+        summary.update(
+            p50=round(_percentile(latencies, 0.5), 4),
+            p99=round(_percentile(latencies, 0.99), 4),
+            mean=round(sum(latencies) / ops, 4),
+            ops_per_s=round(ops / raw['wall'], 3) if raw['wall'] else None,
+            mb_per_s=round(raw['output_bytes'] / raw['wall'] / 1e6, 2) if raw['wall'] else None,
+        )
+    return summary
+
+def run_scenario(name, args, server):
+    """Run one scenario in a child process; return its summary."""
+    cache_home = tempfile.mkdtemp(prefix="ytdl-bench-cache-")
+    result_path = os.path.join(cache_home, "result.json")
+    env = dict(os.environ, XDG_CACHE_HOME=cache_home, YTDL_BENCH_SERVER=server.base_url,
+               YTDL_BENCH_FIXTURES=server.folder)
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', name, '--result', result_path,
+           '--iterations', str(args.iterations), '--users', str(args.users), '--seed', str(args.seed),
+           '--media-duration', str(args.media_duration)]
+    sent_before = server.bytes_sent
+    server.fail_every = SERVER_FAULTS.get(name, 0)
+    try:
+        # yt-dlp is chatty on stdout; keep only stderr for error reports
+        process = subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if process.returncode != 0 or not os.path.exists(result_path):
+            return {'error': (process.stderr.strip().splitlines() or ["no output"])[-1]}
+        with open(result_path, 'r', encoding='utf-8') as f:
+            raw = json.load(f)
+    finally:
+        server.fail_every = 0
+        shutil.rmtree(cache_home, ignore_errors=True)
+    summary = summarize(raw, server.bytes_sent - sent_before)
+    if raw['errors']:
+        summary['first_error'] = raw['errors'][0]
+    return summary
+
+def _format_row(name, summary):
+    if 'error' in summary or 'skipped' in summary:
+        return f"{name:<18} {summary.get('error') or summary['skipped']}"
+    if not summary['ops']:
+        return f"{name:<18} no successful operations: {summary.get('first_error', '')}"
+    return (f"{name:<18} {summary['ops']:>4} {summary['p50'] * 1000:>9.1f} {summary['p99'] * 1000:>9.1f} "
+            f"{summary['ops_per_s']:>8.2f} {summary['mb_per_s']:>7.2f} "
+            f"{summary['bytes_on_wire'] / 1e6:>9.2f} {summary['peak_rss_mb'] or 0:>7.1f}"
+            + (f"  ({summary['errors']} errors)" if summary['errors'] else ""))
+
+def print_report(results):
+    print(f"{'scenario':<18} {'ops':>4} {'p50 ms':>9} {'p99 ms':>9} {'ops/s':>8} {'MB/s':>7} "
+          f"{'wire MB':>9} {'RSS MB':>7}")
+    for name, summary in results.items():
+        print(_format_row(name, summary))
+
+def compare(results, baseline, threshold):
+    """Return a list of regressions beyond threshold (a fraction) against the baseline."""
+    regressions = []
+    for name, summary in results.items():
+        reference = baseline.get('scenarios', {}).get(name)
+        if not reference or 'ops' not in summary or 'ops' not in reference:
+            continue
+        for metric, higher_is_worse in COMPARED_METRICS.items():
+            current, previous = summary.get(metric), reference.get(metric)
+            if not current or not previous:
+                continue
+            if metric in ('p50', 'p99') and abs(current - previous) < LATENCY_NOISE:
+                continue
+            change = (current - previous) / previous
+            if (change if higher_is_worse else -change) > threshold:
+                regressions.append(f"{name}.{metric}: {previous} -> {current} ({change:+.0%})")
+    return regressions
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the YouTube downloader")
+    parser.add_argument('--scenarios', help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument('--iterations', type=int, default=5,
+                        help="operations per scenario (per user for 'concurrent')")
+    parser.add_argument('--users', type=int, default=8, help="simultaneous users for 'concurrent'")
+    parser.add_argument('--seed', type=int, default=1, help="random seed for 'concurrent'")
+    parser.add_argument('--rate', type=float, default=0,
+                        help="per-connection server bandwidth limit in MB/s (default: unlimited)")
+    parser.add_argument('--latency', type=float, default=0, help="server latency per request in ms")
+    parser.add_argument('--media-duration', type=int, default=60, help="length of the generated media in seconds")
+    parser.add_argument('--fixtures', help="folder for the generated media (default: in the cache folder)")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="baseline file to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="allowed regression against the baseline, as a fraction (default: 0.15)")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.child:
+        return run_child(args)
+
+    names = args.scenarios.split(',') if args.scenarios else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    if not shutil.which('ffmpeg'):
+        print("FFmpeg not found. Please install FFmpeg and add it to your PATH.", file=sys.stderr)
+        return 2
+
+    from ytdownloader.utils import get_cache_folder
+
+    fixtures = args.fixtures or os.path.join(get_cache_folder(), "benchmark-media")
+    print(f"Generating media in {fixtures} ...", file=sys.stderr)
+    manifest = generate_fixtures(fixtures, args.media_duration)
+    server = MediaServer(fixtures, manifest, rate=args.rate * 1e6, latency=args.latency / 1000).start()
+
+    has_ffprobe = shutil.which('ffprobe') is not None
+    results = {}
+    try:
+        for name in names:
+            if SCENARIOS[name][1] and not has_ffprobe:
+                results[name] = {'skipped': "skipped: needs ffprobe"}
+                continue
+            print(f"Running {name} ...", file=sys.stderr)
+            results[name] = run_scenario(name, args, server)
+    finally:
+        server.shutdown()
+
+    print_report(results)
+    meta = {
+        'iterations': args.iterations,
+        'users': args.users,
+        'rate': args.rate,
+        'latency': args.latency,
+        'media_duration': args.media_duration,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    output = {'meta': meta, 'scenarios': results}
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    settings = ('iterations', 'users', 'rate', 'latency', 'media_duration', 'cpus')
+    if any(baseline.get('meta', {}).get(key) != meta[key] for key in settings):
+        print("Note: the baseline was recorded with different settings or hardware.")
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\nRegressions beyond {args.threshold:.0%} against {args.baseline}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,24 @@
+"""yt-dlp plugin extractor that answers benchmark video IDs from the local media server.
+
+yt-dlp loads it because benchmarks/ is on sys.path when benchmarks/run.py
+runs, and plugin extractors are tried before the built-in YouTube one.
+Only IDs starting with 'bench' are claimed; everything else goes to
+YouTube as usual. The server address comes from YTDL_BENCH_SERVER.
+"""
+
+import os
+
+from yt_dlp.extractor.common import InfoExtractor
+
+class BenchmarkYoutubeIE(InfoExtractor):
+    IE_NAME = 'youtube:benchmark'
+    _VALID_URL = r'https?://(?:www\.)?youtube\.com/watch\?v=(?P<id>bench[\w-]{6})'
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        server = os.environ['YTDL_BENCH_SERVER']
+        info = self._download_json(f"{server}/{video_id}/info.json", video_id, note="Downloading benchmark info")
+        mpd_url = info.pop('mpd_url', None)
+        if mpd_url:
+            info['formats'] = self._extract_mpd_formats(mpd_url, video_id, mpd_id='dash')
+        return info
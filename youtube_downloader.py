@@ -1,276 +1,94 @@
 import streamlit as st
-import yt_dlp
 import os
-import subprocess
-import tempfile
-from pathlib import Path
+import time
 
-def get_downloads_folder():
-    """Get the Downloads folder path for the current user."""
-    home = Path.home()
-    downloads_folder = home / "Downloads"
-    return str(downloads_folder)
+from ytdownloader import (
+    JobManager,
+    chapters_to_segments,
+    clean_youtube_url,
+    download_clips,
+    download_video,
+    format_bytes,
+    get_downloads_folder,
+    get_metrics,
+    get_info_cache,
+    get_source_cache,
+    get_video_info,
+    log_events,
+    parse_segments,
+    parse_time_to_seconds,
+    plan_formats,
+    read_url_list,
+    request_key,
+    run_batch,
+    start_stream_server,
+    stream_query,
+)
 
-def clean_youtube_url(url):
-    """Clean and validate YouTube URL."""
-    import re
-    
-    # Remove extra parameters that might cause issues
-    if '&' in url:
-        url = url.split('&')[0]
-    
-    # Ensure it's a valid YouTube URL
-    youtube_patterns = [
-        r'(?:https?://)?(?:www\.)?youtube\.com/watch\?v=([a-zA-Z0-9_-]{11})',
-        r'(?:https?://)?(?:www\.)?youtu\.be/([a-zA-Z0-9_-]{11})',
-        r'(?:https?://)?(?:www\.)?youtube\.com/embed/([a-zA-Z0-9_-]{11})',
-    ]
-    
-    for pattern in youtube_patterns:
-        match = re.search(pattern, url)
-        if match:
-            video_id = match.group(1)
-            return f"https://www.youtube.com/watch?v={video_id}"
-    
-    return url  # Return original if no pattern matches
+@st.cache_resource
+def get_job_manager():
+    """Process-wide job manager shared by all sessions."""
+    return JobManager()
 
-def get_video_info(url):
-    """Get video information without downloading."""
-    ydl_opts = {
-        'quiet': False,  # Show warnings for debugging
-        'no_warnings': False,
-        'extract_flat': False,
-        'socket_timeout': 30,  # 30 second timeout
-        'retries': 3,  # Retry up to 3 times
-    }
-    
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            if info:
-                return True, info
-            else:
-                return False, "No video information found"
-    except Exception as e:
-        error_msg = str(e)
-        # Provide more specific error messages
-        if "Private video" in error_msg:
-            return False, "This video is private and cannot be accessed"
-        elif "Video unavailable" in error_msg:
-            return False, "This video is unavailable (may be deleted or restricted)"
-        elif "Sign in to confirm your age" in error_msg:
-            return False, "This video is age-restricted and requires sign-in"
-        elif "Video not available" in error_msg:
-            return False, "This video is not available in your region"
-        elif "HTTP Error 403" in error_msg:
-            return False, "Access denied - video may be restricted"
-        elif "HTTP Error 404" in error_msg:
-            return False, "Video not found - may be deleted or URL is incorrect"
-        elif "timeout" in error_msg.lower():
-            return False, "Request timed out - video may be unavailable or slow to load"
-        else:
-            return False, f"Error: {error_msg}"
+@st.cache_resource
+def get_stream_base_url():
+    """Start the streaming server if YTDL_STREAM_PORT is set; return its public base URL or None."""
+    if not os.environ.get('YTDL_STREAM_PORT'):
+        return None
+    server = start_stream_server()
+    return os.environ.get('YTDL_STREAM_URL') or f"http://localhost:{server.server_port}"
 
-def download_video(url, output_folder, start_time=None, end_time=None, audio_only=False):
-    """Download YouTube video using yt-dlp with specified options."""
-    if audio_only:
-        ydl_opts = {
-            'format': 'bestaudio[ext=m4a]/bestaudio/best',
-            'outtmpl': os.path.join(output_folder, '%(title)s.%(ext)s'),
-            'noplaylist': True,
-            'writesubtitles': False,
-            'writeautomaticsub': False,
-            'ignoreerrors': False,
-            'no_warnings': False,
-            'extract_flat': False,
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '320',
-            }],
-        }
-    else:
-        ydl_opts = {
-            'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-            'merge_output_format': 'mp4',
-            'outtmpl': os.path.join(output_folder, '%(title)s.%(ext)s'),
-            'noplaylist': True,
-            'writesubtitles': False,
-            'writeautomaticsub': False,
-            'ignoreerrors': False,
-            'no_warnings': False,
-            'extract_flat': False,
-        }
-    
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            # Extract video info first to get the title
-            info = ydl.extract_info(url, download=False)
-            video_title = info.get('title', 'Unknown')
-            duration = info.get('duration', 0)
-            
-            # Check if video formats are available
-            formats = info.get('formats', [])
-            video_formats = [f for f in formats if f.get('vcodec') != 'none']
-            
-            if not video_formats:
-                return False, "No video formats available for this URL", None, duration
-            
-            # Download the video
-            ydl.download([url])
-            
-            # Find the downloaded file - look for .mp4 or .mp3 files
-            file_extension = '.mp3' if audio_only else '.mp4'
-            downloaded_files = []
-            for file in os.listdir(output_folder):
-                if file.endswith(file_extension):
-                    # Check if the filename contains the video title (with some flexibility)
-                    title_clean = video_title.replace(' ', '').replace('｜', '').replace('|', '').lower()
-                    file_clean = file.replace(' ', '').replace('｜', '').replace('|', '').lower()
-                    
-                    # Check if video title is contained in filename or vice versa
-                    if (title_clean in file_clean or file_clean in title_clean or 
-                        any(word in file_clean for word in title_clean.split() if len(word) > 3)):
-                        downloaded_files.append(os.path.join(output_folder, file))
-            
-            if downloaded_files:
-                # Get the most recently created file
-                file_path = max(downloaded_files, key=os.path.getctime)
-                
-                # If trimming is requested, use ffmpeg to trim the video
-                if start_time is not None and end_time is not None:
-                    trimmed_path = trim_video(file_path, start_time, end_time, video_title)
-                    if trimmed_path:
-                        # Clean up the original full video file
-                        try:
-                            os.remove(file_path)
-                        except:
-                            pass  # Ignore if file can't be deleted
-                        return True, trimmed_path, video_title, duration
-                    else:
-                        return False, "Failed to trim video", video_title, duration
-                
-                return True, file_path, video_title, duration
-            else:
-                # If no specific match, look for any recent files
-                import time
-                recent_files = []
-                current_time = time.time()
-                for file in os.listdir(output_folder):
-                    if file.endswith(file_extension):
-                        file_path = os.path.join(output_folder, file)
-                        # Check if file was created in the last 5 minutes
-                        if (current_time - os.path.getctime(file_path)) < 300:
-                            recent_files.append(file_path)
-                
-                if recent_files:
-                    file_path = max(recent_files, key=os.path.getctime)
-                    
-                    # If trimming is requested, use ffmpeg to trim the video
-                    if start_time is not None and end_time is not None:
-                        trimmed_path = trim_video(file_path, start_time, end_time, video_title)
-                        if trimmed_path:
-                            # Clean up the original full video file
-                            try:
-                                os.remove(file_path)
-                            except:
-                                pass  # Ignore if file can't be deleted
-                            return True, trimmed_path, video_title, duration
-                        else:
-                            return False, "Failed to trim video", video_title, duration
-                    
-                    return True, file_path, video_title, duration
-                else:
-                    return False, "Video downloaded but MP4 file not found", video_title, duration
-                
-    except Exception as e:
-        return False, f"Download failed: {str(e)}", None, 0
+@st.cache_resource
+def setup_event_log():
+    """Send the JSON phase events to YTDL_EVENTS: a file, or '-' (the default) for stderr."""
+    target = os.environ.get('YTDL_EVENTS', '-')
+    return log_events(target) if target else None
 
-def trim_video(input_path, start_time, end_time, video_title):
-    """Trim video using ffmpeg."""
-    import time
-    try:
-        # Create output filename
-        output_folder = get_downloads_folder()
-        
-        # Clean filename for filesystem - keep more characters but remove problematic ones
-        safe_title = "".join(c for c in video_title if c.isalnum() or c in "._- ").strip()
-        # Remove multiple spaces and replace with single space
-        safe_title = " ".join(safe_title.split())
-        # Limit filename length
-        if len(safe_title) > 100:
-            safe_title = safe_title[:100]
-        
-        output_filename = f"{safe_title}_clip.mp4"
-        output_path = os.path.join(output_folder, output_filename)
-        
-        # Debug: Show the paths being used
-        st.info(f"Input file: {input_path}")
-        st.info(f"Output file: {output_path}")
-        
-        # Run ffmpeg command with better seeking to avoid white screen
-        cmd = [
-            'ffmpeg',
-            '-ss', str(start_time),  # Seek before input for better accuracy
-            '-i', input_path,
-            '-t', str(end_time - start_time),  # Use duration instead of end time
-            '-c', 'copy',
-            '-avoid_negative_ts', 'make_zero',
-            '-y',  # Overwrite output file if it exists
-            output_path
-        ]
-        
-        # Execute ffmpeg command
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0 and os.path.exists(output_path):
-            return output_path
+def render_job(job):
+    """Show one job's live state."""
+    st.markdown(f"**{job['label']}** — {job['status']}" + (f" ({job['phase']})" if job['phase'] else ""))
+    if job.get('plan'):
+        st.caption(f"Plan: {job['plan']['summary']}")
+
+    total = job.get('total_bytes')
+    done = job.get('downloaded_bytes')
+    if job['status'] == 'running' and total and done is not None:
+        st.progress(min(done / total, 1.0))
+        details = [f"{format_bytes(done)} / {format_bytes(total)}"]
+        if job.get('speed'):
+            details.append(f"{format_bytes(job['speed'])}/s")
+        if job.get('eta') is not None:
+            details.append(f"ETA {int(job['eta']) // 60}:{int(job['eta']) % 60:02d}")
+        st.caption(" · ".join(details))
+    elif job['status'] == 'running' and job.get('total'):
+        st.progress(min(job['completed'] / job['total'], 1.0))
+        st.caption(f"{job['completed']} / {job['total']} items")
+
+    # Batch jobs report every item's status and error
+    if job.get('items'):
+        st.dataframe(
+            [{key: item[key] for key in ('url', 'status', 'attempts', 'title', 'error')} for item in job['items']],
+            use_container_width=True,
+        )
+
+    if job['status'] == 'done':
+        result = job['result']
+        if isinstance(result, list):
+            st.success(f"✅ {len(result)} files saved")
+            if result:
+                st.caption(f"Location: `{os.path.dirname(result[0])}`")
+        elif isinstance(result, str) and os.path.exists(result):
+            st.success(f"✅ Saved as `{os.path.basename(result)}`")
+            st.caption(f"Location: `{result}`")
         else:
-            # Try with a different approach for better keyframe handling
-            st.warning("First attempt failed, trying with re-encoding for better accuracy...")
-            
-            # Alternative command with re-encoding to avoid keyframe issues
-            cmd2 = [
-                'ffmpeg',
-                '-ss', str(start_time),
-                '-i', input_path,
-                '-t', str(end_time - start_time),
-                '-c:v', 'libx264',  # Re-encode video to avoid keyframe issues
-                '-c:a', 'aac',      # Re-encode audio
-                '-preset', 'fast',   # Fast encoding
-                '-crf', '23',        # Good quality
-                '-y',
-                output_path
-            ]
-            
-            result2 = subprocess.run(cmd2, capture_output=True, text=True)
-            
-            if result2.returncode == 0 and os.path.exists(output_path):
-                return output_path
-            else:
-                # Try with a simpler filename as final fallback
-                st.warning("Re-encoding failed, trying with simpler filename...")
-                simple_filename = f"video_clip_{int(time.time())}.mp4"
-                simple_output_path = os.path.join(output_folder, simple_filename)
-                
-                cmd2[8] = simple_output_path  # Update the output path
-                result3 = subprocess.run(cmd2, capture_output=True, text=True)
-                
-                if result3.returncode == 0 and os.path.exists(simple_output_path):
-                    return simple_output_path
-                else:
-                    st.error(f"FFmpeg error: {result.stderr}")
-                    st.error(f"Re-encoding error: {result2.stderr}")
-                    st.error(f"Final fallback error: {result3.stderr}")
-                    st.error(f"Commands used: {' '.join(cmd)} | {' '.join(cmd2)}")
-                    return None
-            
-    except FileNotFoundError:
-        st.error("FFmpeg not found. Please install FFmpeg and add it to your PATH.")
-        return None
-    except Exception as e:
-        st.error(f"Error trimming video: {str(e)}")
-        return None
+            st.success(f"✅ {result}")
+    elif job['status'] == 'failed':
+        st.error(f"❌ {job['error']}")
+
+def track_job(job_id):
+    """Remember a job for this session (and in the URL, so it survives a refresh)."""
+    st.session_state.jobs.append(job_id)
+    st.experimental_set_query_params(jobs=",".join(st.session_state.jobs))
 
 def main():
     st.set_page_config(
@@ -282,8 +100,39 @@ def main():
     st.title("📥 YouTube Video Downloader & Trimmer")
     st.markdown("Download YouTube videos in the highest available quality or trim specific segments!")
     
+    setup_event_log()
+
     # Get Downloads folder path
     downloads_folder = get_downloads_folder()
+    # Remote users can stream results instead of saving them on the server
+    stream_base_url = get_stream_base_url()
+
+    # Cache statistics
+    with st.sidebar.expander("🗄️ Cache statistics"):
+        info_stats = get_info_cache().stats()
+        st.markdown(f"**Info cache:** {info_stats['hits']} hits / {info_stats['misses']} misses")
+        st.markdown(f"**Entries:** {info_stats['entries']} ({info_stats['bytes'] / 1024:.0f} KB)")
+        source_stats = get_source_cache().stats()
+        st.markdown(
+            f"**Source cache:** {source_stats['hits']} hits / {source_stats['misses']} misses "
+            f"({source_stats['hit_rate']:.0%} hit rate)"
+        )
+        st.markdown(
+            f"**Sources:** {source_stats['entries']} ({source_stats['bytes'] / 1024 ** 2:.0f} MB), "
+            f"{source_stats['bytes_saved'] / 1024 ** 2:.0f} MB saved"
+        )
+
+    # Where the time goes, per phase and path taken
+    with st.sidebar.expander("⏱️ Timing"):
+        timings = [h for h in get_metrics().snapshot()['histograms'] if h['name'] == 'ytdl_phase_seconds']
+        if not timings:
+            st.caption("No timed phases yet")
+        for h in timings:
+            labels = h['labels']
+            name = labels['phase'] + (f" ({labels['method']})" if labels.get('method') else "")
+            if labels.get('outcome') == 'error':
+                name += " ❌"
+            st.markdown(f"**{name}:** {h['count']}× avg {h['sum'] / h['count']:.2f}s")
     
     # Create input field for YouTube URL
     url = st.text_input(
@@ -292,6 +141,14 @@ def main():
         help="Paste the YouTube video URL you want to download"
     )
     
+    # Background jobs are shared across sessions; this session only tracks its IDs
+    job_manager = get_job_manager()
+    if 'jobs' not in st.session_state:
+        # Restore jobs after a page refresh from the URL
+        st.session_state.jobs = [
+            job_id for job_id in st.experimental_get_query_params().get('jobs', [''])[0].split(',') if job_id
+        ]
+
     # Initialize session state for video info
     if 'video_info' not in st.session_state:
         st.session_state.video_info = None
@@ -361,17 +218,6 @@ def main():
                 )
             
             # Convert MM:SS to seconds
-            def parse_time_to_seconds(time_str):
-                try:
-                    if ':' in time_str:
-                        parts = time_str.split(':')
-                        if len(parts) == 2:
-                            minutes, seconds = int(parts[0]), int(parts[1])
-                            return minutes * 60 + seconds
-                    return int(time_str)  # Fallback to seconds if no colon
-                except:
-                    return 0
-            
             start_time = parse_time_to_seconds(start_time_str)
             end_time = parse_time_to_seconds(end_time_str)
             
@@ -393,65 +239,175 @@ def main():
             # Download type selection
             download_type = st.radio(
                 "Choose download type:",
-                ["🎥 Video (MP4)", "🎵 Audio Only (MP3)"],
-                horizontal=True
+                ["🎥 Video (MP4)", "🎵 Audio (Original)", "🎵 Audio (MP3)"],
+                horizontal=True,
+                help="Original keeps YouTube's m4a/opus audio as-is (no conversion); MP3 converts to 320 kbps"
             )
             
-            is_audio_only = download_type == "🎵 Audio Only (MP3)"
+            is_audio_only = download_type != "🎥 Video (MP4)"
+            audio_format = 'mp3' if download_type == "🎵 Audio (MP3)" else 'native'
+            file_type = "Audio" if is_audio_only else "Video"
+
+            max_height = None
+            if not is_audio_only:
+                quality = st.selectbox(
+                    "Max resolution:",
+                    ["Best", "2160p", "1440p", "1080p", "720p", "480p", "360p"],
+                    help="Lower caps download less; a pre-muxed format is used when one fits, skipping the merge"
+                )
+                max_height = None if quality == "Best" else int(quality[:-1])
+
+            # Estimated cost of the download, from the formats already loaded
+            plan = plan_formats(video_info, audio_only=is_audio_only, audio_format=audio_format,
+                                max_height=max_height)
+            if plan:
+                st.caption(f"📋 Plan: {plan['summary']}")
             
             col_dl1, col_dl2 = st.columns(2)
             
             with col_dl1:
                 if st.button("🚀 Download Full", type="primary", use_container_width=True):
-                    with st.spinner(f"Downloading {'audio' if is_audio_only else 'video'}... Please wait."):
-                        success, result, title, _ = download_video(url, downloads_folder, audio_only=is_audio_only)
-                    
-                    if success:
-                        file_type = "Audio" if is_audio_only else "Video"
-                        st.success(f"✅ {file_type} downloaded successfully!")
-                        st.info(f"**File saved as:** `{os.path.basename(result)}`")
-                        st.info(f"**Location:** `{result}`")
-                        if is_audio_only:
-                            st.info("**Quality:** 320 kbps MP3")
-                    else:
-                        st.error(f"❌ Download failed: {result}")
+                    job_id = job_manager.submit(
+                        f"{file_type}: {video_info.get('title', 'Unknown')}",
+                        download_video, url, downloads_folder, audio_only=is_audio_only,
+                        audio_format=audio_format, max_height=max_height,
+                        coalesce_key=request_key(url, downloads_folder, audio_only=is_audio_only,
+                                                 audio_format=audio_format, max_height=max_height)
+                    )
+                    track_job(job_id)
+                    st.info("📥 Download started - progress is shown below")
+                if stream_base_url:
+                    st.link_button(
+                        "📡 Stream Full", use_container_width=True,
+                        url=f"{stream_base_url}/stream?" + stream_query(
+                            url, audio_only=is_audio_only, audio_format=audio_format, max_height=max_height
+                        ),
+                    )
             
             with col_dl2:
-                # Only show trimming for video downloads
-                if not is_audio_only:
-                    # Validate time inputs before allowing download
-                    time_valid = True
-                    if start_time >= end_time:
-                        st.warning("⚠️ End time must be greater than start time")
-                        time_valid = False
-                    elif start_time < 0 or end_time < 0:
-                        st.warning("⚠️ Time values must be positive")
-                        time_valid = False
-                    elif end_time > max_duration:
-                        st.warning(f"⚠️ End time exceeds video duration ({max_duration // 60}:{max_duration % 60:02d})")
-                        time_valid = False
-                    
-                    if st.button("✂️ Download Selected Part", type="primary", use_container_width=True, disabled=not time_valid):
-                        if time_valid:
-                            with st.spinner("Downloading and trimming video... Please wait."):
-                                success, result, title, _ = download_video(url, downloads_folder, start_time, end_time)
-                            
-                            if success:
-                                st.success(f"✅ Video clip downloaded successfully!")
-                                st.info(f"**File saved as:** `{os.path.basename(result)}`")
-                                st.info(f"**Location:** `{result}`")
-                                st.info(f"**Duration:** {clip_duration // 60}:{clip_duration % 60:02d}")
-                            else:
-                                st.error(f"❌ Download failed: {result}")
-                        else:
-                            st.error("❌ Please fix the time inputs before downloading")
-                else:
-                    st.info("🎵 Audio trimming not available - download full audio track")
+                # Validate time inputs before allowing download
+                time_valid = True
+                if start_time >= end_time:
+                    st.warning("⚠️ End time must be greater than start time")
+                    time_valid = False
+                elif start_time < 0 or end_time < 0:
+                    st.warning("⚠️ Time values must be positive")
+                    time_valid = False
+                elif end_time > max_duration:
+                    st.warning(f"⚠️ End time exceeds video duration ({max_duration // 60}:{max_duration % 60:02d})")
+                    time_valid = False
+                
+                keep_source = st.checkbox(
+                    "Keep full source for more clips",
+                    help="Download the whole video once into the local cache so further clips from it are instant"
+                )
+                if st.button("✂️ Download Selected Part", type="primary", use_container_width=True, disabled=not time_valid):
+                    if time_valid:
+                        job_id = job_manager.submit(
+                            f"{file_type} clip {start_time_str}-{end_time_str}: {video_info.get('title', 'Unknown')}",
+                            download_video, url, downloads_folder, start_time, end_time,
+                            audio_only=is_audio_only, audio_format=audio_format,
+                            cache_source=keep_source, max_height=max_height,
+                            coalesce_key=request_key(url, downloads_folder, start_time, end_time,
+                                                     is_audio_only, audio_format, max_height)
+                        )
+                        track_job(job_id)
+                        st.info("✂️ Clip download started - progress is shown below")
+                    else:
+                        st.error("❌ Please fix the time inputs before downloading")
+                if stream_base_url and time_valid:
+                    st.link_button(
+                        "📡 Stream Selected Part", use_container_width=True,
+                        help="Sent straight to your browser, cut at keyframes; nothing is saved on the server",
+                        url=f"{stream_base_url}/stream?" + stream_query(
+                            url, start_time, end_time, is_audio_only, audio_format, max_height
+                        ),
+                    )
+
+        # Many clips from one source read
+        with st.expander("🎬 Multi-Clip Extraction"):
+            segments_text = st.text_area(
+                "Segments (one per line: start-end title):",
+                placeholder="0:30-1:15 Intro\n12:00-12:45 Highlight",
+            )
+            segments_file = st.file_uploader("...or load a CSV/JSON chapter file", type=["csv", "json"])
+            chapters = chapters_to_segments(video_info)
+            use_chapters = st.checkbox(
+                f"Use the video's own chapters ({len(chapters)})",
+                disabled=not chapters,
+            )
+            col_mc1, col_mc2 = st.columns(2)
+            with col_mc1:
+                accurate_clips = st.checkbox("Frame-accurate cuts", help="Smart-cut each clip instead of cutting at keyframes")
+            with col_mc2:
+                zip_clips = st.checkbox("Zip the clips")
+
+            if use_chapters:
+                segments = chapters
+            elif segments_file is not None:
+                segments = parse_segments(segments_file.getvalue().decode('utf-8', errors='ignore'))
+            else:
+                segments = parse_segments(segments_text or "")
+
+            if segments:
+                st.caption(f"{len(segments)} clip(s) selected")
+            if st.button("🎬 Extract Clips", disabled=not segments):
+                job_id = job_manager.submit(
+                    f"{len(segments)} clips: {video_info.get('title', 'Unknown')}",
+                    download_clips, url, downloads_folder, segments,
+                    accurate=accurate_clips, zip_output=zip_clips
+                )
+                track_job(job_id)
+                st.info("🎬 Clip extraction started - progress is shown below")
     
-    # Instructions
+    # Batch / playlist downloads
     st.markdown("---")
+    with st.expander("📚 Batch & Playlist Download"):
+        batch_text = st.text_area(
+            "Video or playlist URLs (one per line):",
+            placeholder="https://www.youtube.com/watch?v=...\nhttps://www.youtube.com/playlist?list=...",
+        )
+        batch_file = st.file_uploader("...or upload a text file of URLs", type=["txt"])
+        col_b1, col_b2, col_b3 = st.columns(3)
+        with col_b1:
+            batch_workers = st.number_input("Workers", min_value=1, max_value=16, value=4)
+        with col_b2:
+            batch_per_host = st.number_input("Per-host limit", min_value=1, max_value=16, value=4)
+        with col_b3:
+            batch_audio = st.checkbox("Audio only")
+            batch_mp3 = st.checkbox("Convert audio to MP3", disabled=not batch_audio)
+
+        batch_urls = read_url_list(batch_text or "")
+        if batch_file is not None:
+            batch_urls += read_url_list(batch_file.getvalue().decode('utf-8', errors='ignore'))
+
+        if st.button("📚 Download Batch", disabled=not batch_urls):
+            job_id = job_manager.submit(
+                f"Batch of {len(batch_urls)} URL(s)",
+                run_batch, batch_urls, downloads_folder,
+                coordinator=True,
+                max_workers=int(batch_workers),
+                per_host_limit=int(batch_per_host),
+                audio_only=batch_audio,
+                audio_format='mp3' if batch_mp3 else 'native',
+            )
+            track_job(job_id)
+            st.info("📚 Batch started - progress is shown below")
+
+    # Job progress - poll job state instead of blocking on downloads
+    jobs = [job for job in (job_manager.get(job_id) for job_id in st.session_state.jobs) if job]
+    if jobs:
+        st.markdown("---")
+        st.subheader("⏳ Downloads")
+        for job in reversed(jobs):
+            render_job(job)
+        if any(job['status'] in ('queued', 'running') for job in jobs):
+            if st.checkbox("Auto-refresh progress", value=True):
+                time.sleep(1)
+                st.rerun()
+
+    # Instructions
     col_inst1, col_inst2 = st.columns(2)
-    
 
 if __name__ == "__main__":
     main()
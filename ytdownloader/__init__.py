@@ -0,0 +1,73 @@
+"""Headless core of the YouTube downloader.
+
+Everything here runs without Streamlit; yt-dlp is only imported when a
+function actually needs it, so importing the package (or running the CLI
+with --help) stays fast.
+"""
+
+# Public name -> submodule. Submodules are imported on first attribute
+# access so the CLI and cache-hit lookups only load what they use.
+_EXPORTS = {
+    'BatchDownloader': 'batch',
+    'iter_batch_entries': 'batch',
+    'read_url_list': 'batch',
+    'run_batch': 'batch',
+    'DownloadIndex': 'cache',
+    'InfoCache': 'cache',
+    'SourceCache': 'cache',
+    'get_download_index': 'cache',
+    'get_info_cache': 'cache',
+    'get_source_cache': 'cache',
+    'download_clips': 'download',
+    'download_section': 'download',
+    'download_video': 'download',
+    'fetch_formats': 'download',
+    'request_key': 'download',
+    'resolve_info': 'download',
+    'ydl_options': 'download',
+    'FetchError': 'fetch',
+    'fetch_url': 'fetch',
+    'plan_formats': 'formats',
+    'plan_summary': 'formats',
+    'get_download_plan': 'info',
+    'get_video_info': 'info',
+    'JobManager': 'jobs',
+    'MetricsRegistry': 'metrics',
+    'get_metrics': 'metrics',
+    'log_events': 'metrics',
+    'phase': 'metrics',
+    'SingleFlight': 'singleflight',
+    'YDLPool': 'pool',
+    'get_ydl_pool': 'pool',
+    'chapters_to_segments': 'segments',
+    'parse_segments': 'segments',
+    'parse_time_to_seconds': 'segments',
+    'PipeStream': 'stream',
+    'make_stream_server': 'stream',
+    'open_stream': 'stream',
+    'start_stream_server': 'stream',
+    'stream_query': 'stream',
+    'extract_clips': 'trim',
+    'smart_cut': 'trim',
+    'trim_video': 'trim',
+    'clean_youtube_url': 'urls',
+    'extract_video_id': 'urls',
+    'format_bytes': 'utils',
+    'get_cache_folder': 'utils',
+    'get_downloads_folder': 'utils',
+    'safe_filename': 'utils',
+}
+
+__all__ = sorted(_EXPORTS)
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    value = getattr(import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
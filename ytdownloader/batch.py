@@ -0,0 +1,245 @@
+"""Batch and playlist downloads through a bounded worker pool."""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from .download import download_video
+from .pool import get_ydl_pool
+from .urls import clean_youtube_url, extract_video_id
+
+# Errors that will not go away by retrying
+PERMANENT_ERRORS = (
+    "Private video",
+    "Video unavailable",
+    "Sign in to confirm your age",
+    "Video not available",
+    "HTTP Error 404",
+    "No video formats available",
+)
+
+def read_url_list(text):
+    """Parse a list of URLs, one per line; blank lines and # comments are ignored."""
+    urls = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith('#'):
+            urls.append(line)
+    return urls
+
+def iter_batch_entries(urls):
+    """Yield one video URL per entry, expanding playlists lazily.
+
+    Playlists are resolved flat (IDs and titles only), so the first entries
+    can start downloading before the rest of the playlist is fetched.
+    """
+    ydl_opts = {
+        'quiet': True,
+        'extract_flat': 'in_playlist',
+        'lazy_playlist': True,
+        'socket_timeout': 30,
+    }
+    with get_ydl_pool().checkout('flat', ydl_opts) as ydl:
+        for url in urls:
+            # Single videos need no resolution at all
+            if extract_video_id(url):
+                yield clean_youtube_url(url)
+                continue
+
+            info = ydl.extract_info(url, download=False, process=False)
+            if info.get('_type') not in ('playlist', 'multi_video'):
+                yield info.get('webpage_url') or url
+                continue
+
+            for entry in info.get('entries') or []:
+                if not entry:
+                    continue
+                entry_url = entry.get('url') or entry.get('webpage_url') or ''
+                if not entry_url.startswith(('http://', 'https://')) and entry.get('id'):
+                    entry_url = f"https://www.youtube.com/watch?v={entry['id']}"
+                if entry_url:
+                    yield entry_url
+
+class BatchDownloader:
+    """Download many URLs through a bounded worker pool.
+
+    Concurrency is limited globally (`max_workers`) and per host
+    (`per_host_limit`, no lower than max_workers by default). Items wait in per-host queues and are only handed
+    to a worker when their host has a free slot, so a busy host never ties
+    up workers that other hosts could use. Failed items are retried with
+    exponential backoff, waiting in their queue rather than in a worker;
+    each item's status is tracked in `items`.
+    """
+
+    def __init__(self, output_folder, max_workers=4, per_host_limit=None, max_retries=3,
+                 backoff=2.0, audio_only=False, audio_format='native'):
+        self.output_folder = output_folder
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit or max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.audio_only = audio_only
+        self.audio_format = audio_format
+        self.items = []
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        # host -> deque of (not before, item), hosts in round-robin order
+        self._queues = {}
+        self._host_running = {}
+        self._running = 0
+        self._unfinished = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch")
+        self._resolver = None
+        self.resolve_error = None
+
+    @staticmethod
+    def _host(url):
+        return urlparse(url).netloc.lower()
+
+    def _update(self, item, **changes):
+        with self._lock:
+            item.update(changes)
+
+    def submit(self, url):
+        """Queue a single video URL and return its status dict."""
+        item = {
+            'url': url,
+            'status': 'queued',
+            'attempts': 0,
+            'title': None,
+            'result': None,
+            'error': None,
+        }
+        with self._lock:
+            self.items.append(item)
+            self._unfinished += 1
+            self._queues.setdefault(self._host(url), deque()).append((0, item))
+        self._dispatch()
+        return item
+
+    def _next_ready(self, now):
+        """Pop the next item whose host has a free slot and whose backoff is over."""
+        for host in list(self._queues):
+            if self._host_running.get(host, 0) >= self.per_host_limit:
+                continue
+            queue = self._queues[host]
+            for entry in queue:
+                if entry[0] <= now:
+                    queue.remove(entry)
+                    # Move the host to the back so hosts take turns
+                    del self._queues[host]
+                    if queue:
+                        self._queues[host] = queue
+                    return entry[1]
+        return None
+
+    def _dispatch(self):
+        """Hand ready items to free workers."""
+        with self._lock:
+            now = time.monotonic()
+            while self._running < self.max_workers:
+                item = self._next_ready(now)
+                if item is None:
+                    break
+                host = self._host(item['url'])
+                self._host_running[host] = self._host_running.get(host, 0) + 1
+                self._running += 1
+                item.update(status='running', attempts=item['attempts'] + 1)
+                self._executor.submit(self._run_item, item)
+
+    def _run_item(self, item):
+        """Make one attempt at an item, then free its slot and requeue it if it should be retried."""
+        try:
+            success, result, title, _ = download_video(
+                item['url'], self.output_folder, audio_only=self.audio_only,
+                audio_format=self.audio_format
+            )
+        except Exception as e:
+            success, result, title = False, str(e), None
+
+        with self._lock:
+            host = self._host(item['url'])
+            self._host_running[host] -= 1
+            self._running -= 1
+            if success:
+                item.update(status='done', title=title, result=result, error=None)
+                self._unfinished -= 1
+            elif any(marker in result for marker in PERMANENT_ERRORS) or item['attempts'] >= self.max_retries:
+                item.update(status='failed', title=title, error=result)
+                self._unfinished -= 1
+            else:
+                item.update(status='retrying', error=result)
+                delay = self.backoff ** item['attempts']
+                self._queues.setdefault(host, deque()).append((time.monotonic() + delay, item))
+                timer = threading.Timer(delay, self._dispatch)
+                timer.daemon = True
+                timer.start()
+            self._changed.notify_all()
+        self._dispatch()
+
+    def start(self, urls):
+        """Resolve URLs (and playlists) in the background, queueing entries as they arrive."""
+        def resolve():
+            try:
+                for entry_url in iter_batch_entries(urls):
+                    self.submit(entry_url)
+            except Exception as e:
+                self.resolve_error = str(e)
+
+        self._resolver = threading.Thread(target=resolve, name="batch-resolver", daemon=True)
+        self._resolver.start()
+
+    def done(self):
+        """True once every URL has been resolved and every item has finished."""
+        if self._resolver and self._resolver.is_alive():
+            return False
+        with self._lock:
+            return self._unfinished == 0
+
+    def wait(self):
+        """Block until the batch is finished and return the item list."""
+        if self._resolver:
+            self._resolver.join()
+        with self._changed:
+            while self._unfinished:
+                self._changed.wait()
+        self._executor.shutdown(wait=True)
+        return self.items
+
+    def snapshot(self):
+        """Return a copy of the per-item status list."""
+        with self._lock:
+            return [dict(item) for item in self.items]
+
+def run_batch(urls, output_folder, progress_callback=None, **options):
+    """Run a BatchDownloader to completion, reporting item counts and per-item status as progress.
+
+    Progress events carry 'completed', 'total' and 'items' (see snapshot).
+    Returns (success, summary, None); success is False if any item failed
+    or not every URL could be resolved.
+    """
+    batch = BatchDownloader(output_folder, **options)
+    batch.start(urls)
+
+    def report(items):
+        if progress_callback:
+            completed = sum(1 for item in items if item['status'] in ('done', 'failed'))
+            progress_callback({'phase': 'download', 'completed': completed, 'total': len(items), 'items': items})
+
+    while not batch.done():
+        report(batch.snapshot())
+        time.sleep(1)
+    batch.wait()
+    items = batch.snapshot()
+    report(items)
+
+    finished = sum(1 for item in items if item['status'] == 'done')
+    failed = [item for item in items if item['status'] == 'failed']
+    if batch.resolve_error:
+        return False, f"Could not resolve all URLs: {batch.resolve_error}", None
+    if failed:
+        return False, (f"{len(failed)} of {len(items)} downloads failed "
+                       f"(first: {failed[0]['url']}: {failed[0]['error']})"), None
+    return True, f"{finished} of {len(items)} downloads finished", None
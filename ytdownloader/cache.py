@@ -0,0 +1,432 @@
+"""Persistent caches: extracted info, finished downloads and source media."""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import parse_qs, urlparse
+
+from .metrics import count_cache
+from .urls import extract_video_id
+from .utils import file_sha256, get_cache_folder
+
+# Top-level keys yt-dlp's format selection adds to an info dict (the chosen
+# format's own fields are copied up as well)
+FORMAT_SELECTION_KEYS = (
+    'requested_formats', 'requested_downloads', 'requested_subtitles', 'format', 'format_id',
+    'format_note', 'ext', 'url', 'protocol', 'http_headers', 'width', 'height', 'resolution', 'fps',
+    'dynamic_range', 'vcodec', 'vbr', 'stretched_ratio', 'aspect_ratio', 'acodec', 'abr', 'asr',
+    'audio_channels', 'language', 'tbr', 'filesize', 'filesize_approx', '_has_drm', 'filepath',
+)
+
+def strip_format_selection(info):
+    """Copy of an info dict without the formats a previous run selected.
+
+    Selection only adds keys and never clears them, so re-processing a
+    processed dict with other format options would keep the old
+    'requested_formats'. The stripped dict can be processed again.
+    """
+    if not info.get('formats'):
+        return info
+    keys = set(FORMAT_SELECTION_KEYS)
+    for fmt in info['formats']:
+        if fmt.get('format_id') is not None and fmt.get('format_id') == info.get('format_id'):
+            keys.update(fmt)
+    return {key: value for key, value in info.items() if key not in keys or key == 'formats'}
+
+class InfoCache:
+    """On-disk cache of extracted info dicts, one JSON file per video ID.
+
+    Entries expire after `ttl` seconds. Signed format URLs expire sooner, so
+    callers that need to download ask for `need_formats=True`, which also
+    checks the URL expiry. The cache is kept under `max_bytes` by evicting
+    the least recently used entries.
+    """
+
+    def __init__(self, folder, ttl=6 * 3600, format_ttl=3600, max_bytes=50 * 1024 * 1024):
+        self.folder = folder
+        self.ttl = ttl
+        self.format_ttl = format_ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, video_id):
+        return os.path.join(self.folder, f"{video_id}.json")
+
+    def _formats_expire_at(self, info, cached_at):
+        """Earliest expiry of the signed format URLs in an info dict."""
+        expires_at = cached_at + self.format_ttl
+        for fmt in info.get('formats') or []:
+            expire = parse_qs(urlparse(fmt.get('url') or '').query).get('expire')
+            if expire and expire[0].isdigit():
+                # Leave a margin so a download doesn't start on an about-to-expire URL
+                expires_at = min(expires_at, int(expire[0]) - 600)
+        return expires_at
+
+    def get(self, video_id, need_formats=False):
+        """Return the cached info dict for a video ID, or None on a miss."""
+        path = self._path(video_id)
+        with self._lock:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                self.misses += 1
+                count_cache('info', False)
+                return None
+
+            now = time.time()
+            expired = now - entry.get('cached_at', 0) > self.ttl
+            if not expired and need_formats and now > entry.get('formats_expire_at', 0):
+                expired = True
+            if expired:
+                self.misses += 1
+                count_cache('info', False)
+                return None
+
+            # Bump the modification time so eviction is least-recently-used
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            self.hits += 1
+            count_cache('info', True)
+            return entry['info']
+
+    def put(self, video_id, info):
+        """Store a (sanitized) info dict for a video ID."""
+        now = time.time()
+        entry = {
+            'cached_at': now,
+            'formats_expire_at': self._formats_expire_at(info, now),
+            'info': info,
+        }
+        with self._lock:
+            tmp_path = self._path(video_id) + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, default=str)
+            os.replace(tmp_path, self._path(video_id))
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.folder):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.folder, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        # Oldest first
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def stats(self):
+        """Return hit/miss counters and current on-disk size."""
+        entries = [n for n in os.listdir(self.folder) if n.endswith('.json')]
+        size = sum(os.path.getsize(os.path.join(self.folder, n)) for n in entries)
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(entries),
+            'bytes': size,
+        }
+
+class DownloadIndex:
+    """Persistent index of finished downloads.
+
+    Maps (video ID, format key) to the output path, size, modification time
+    and checksum so a repeated request can be answered with a dictionary
+    lookup instead of scanning the output folder.
+
+    The file is shared by every process (the app, the CLI, batches):
+    lookups reload it when it changed on disk, and updates reload, modify
+    and write it under a lock file, so no process overwrites another's
+    entries.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        # (inode, mtime_ns, size) of the file as last loaded; every save
+        # replaces the file, so the inode changes even within one mtime tick
+        self._loaded = None
+        with self._lock:
+            self._reload()
+
+    def _reload(self):
+        """Re-read the file if it changed since it was last loaded; call with self._lock held."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        if (stat.st_ino, stat.st_mtime_ns, stat.st_size) == self._loaded:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._loaded = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    @contextmanager
+    def _update(self):
+        """Reload the latest entries for a change, then save them, all under the lock file."""
+        with self._lock, file_lock(self.path + '.lock'):
+            self._reload()
+            yield self._entries
+            self._save()
+
+    @staticmethod
+    def _key(video_id, format_key):
+        return f"{video_id}:{format_key}"
+
+    def get(self, video_id, format_key, output_folder=None):
+        """Return the index entry if the file is still on disk, else None."""
+        with self._lock:
+            self._reload()
+            entry = self._entries.get(self._key(video_id, format_key))
+        if not entry:
+            return None
+        if output_folder and os.path.dirname(entry['path']) != os.path.abspath(output_folder):
+            return None
+        # Size and modification time catch deleted or rewritten files
+        # without reading them; entries without an mtime are checksummed
+        try:
+            stat = os.stat(entry['path'])
+        except OSError:
+            self.remove(video_id, format_key)
+            return None
+        if stat.st_size != entry['size']:
+            return None
+        if entry.get('mtime_ns') is not None:
+            if stat.st_mtime_ns != entry['mtime_ns']:
+                return None
+        elif file_sha256(entry['path']) != entry.get('sha256'):
+            return None
+        return entry
+
+    def add(self, video_id, format_key, path, title=None, duration=None):
+        """Record a finished download."""
+        if not video_id:
+            return
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        entry = {
+            'path': path,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': file_sha256(path),
+            'title': title,
+            'duration': duration,
+            'created': time.time(),
+        }
+        with self._update() as entries:
+            # The file now holds this request's output; older keys for it are stale
+            for key in [k for k, e in entries.items() if e.get('path') == path]:
+                del entries[key]
+            entries[self._key(video_id, format_key)] = entry
+
+    def remove(self, video_id, format_key):
+        with self._update() as entries:
+            entries.pop(self._key(video_id, format_key), None)
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+        stat = os.stat(self.path)
+        self._loaded = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+@contextmanager
+def file_lock(path, shared=False, blocking=True):
+    """Inter-process lock on a lock file; yields True if the lock was acquired.
+
+    Shared locks allow concurrent readers (exclusive on Windows, which only
+    supports exclusive byte-range locks).
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a+b') as f:
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+                if not blocking:
+                    flags |= fcntl.LOCK_NB
+                fcntl.flock(f.fileno(), flags)
+        except OSError:
+            yield False
+            return
+
+        try:
+            yield True
+        finally:
+            if os.name == 'nt':
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+class SourceCache:
+    """Full source files kept for repeated trims, keyed by video ID and format ID.
+
+    Files live in <folder>/<video id>/<format id>.<ext>, outside the Downloads
+    folder. The cache is kept under `max_bytes` by evicting the least
+    recently used sources; entries being written or read are locked and are
+    never evicted.
+    """
+
+    def __init__(self, folder, max_bytes=10 * 1024 ** 3):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def _lock_path(self, video_id, format_id):
+        return os.path.join(self.folder, video_id, f"{format_id}.lock")
+
+    def lock(self, video_id, format_id, shared=False, blocking=True):
+        """Lock one cache entry: exclusive while fetching, shared while reading."""
+        return file_lock(self._lock_path(video_id, format_id), shared=shared, blocking=blocking)
+
+    def get(self, video_id, format_id, count=True):
+        """Return the cached source path, or None."""
+        entry_dir = os.path.join(self.folder, video_id)
+        path = None
+        if os.path.isdir(entry_dir):
+            for name in os.listdir(entry_dir):
+                base, ext = os.path.splitext(name)
+                if base == format_id and ext not in ('.lock', '.part', '.partial', '.journal', '.ytdl', '.tmp'):
+                    path = os.path.join(entry_dir, name)
+                    break
+
+        if not count:
+            return path
+        with self._lock:
+            if path:
+                self.hits += 1
+                count_cache('source', True)
+                self.bytes_saved += os.path.getsize(path)
+                # Bump the modification time so eviction is least-recently-used
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+            else:
+                self.misses += 1
+                count_cache('source', False)
+        return path
+
+    def added(self, path):
+        """Account for a newly fetched source and evict old ones if over budget."""
+        self.evict(keep=path)
+
+    def _entries(self):
+        for video_id in os.listdir(self.folder):
+            entry_dir = os.path.join(self.folder, video_id)
+            if not os.path.isdir(entry_dir):
+                continue
+            for name in os.listdir(entry_dir):
+                base, ext = os.path.splitext(name)
+                if ext in ('.lock', '.part', '.partial', '.journal', '.ytdl', '.tmp'):
+                    continue
+                path = os.path.join(entry_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path, video_id, base
+
+    def evict(self, keep=None):
+        """Remove least recently used sources until the cache fits its budget."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _, _, _ in entries)
+        for _, size, path, video_id, format_id in entries:
+            if total <= self.max_bytes:
+                break
+            if keep and os.path.abspath(path) == os.path.abspath(keep):
+                continue
+            # Skip entries another job is currently reading or writing
+            with self.lock(video_id, format_id, blocking=False) as acquired:
+                if not acquired:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+    def stats(self):
+        """Return hit rate, bytes saved and current size."""
+        entries = list(self._entries())
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'bytes_saved': self.bytes_saved,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _, _, _ in entries),
+        }
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+def _get_shared(name, factory):
+    """Create a process-wide instance on first use and return it on every call."""
+    with _shared_lock:
+        if name not in _shared:
+            _shared[name] = factory()
+        return _shared[name]
+
+def get_source_cache():
+    """Process-wide source media cache shared by all sessions."""
+    max_bytes = int(os.environ.get('YTDL_SOURCE_CACHE_BYTES', 10 * 1024 ** 3))
+    return _get_shared('sources', lambda: SourceCache(os.path.join(get_cache_folder(), "sources"),
+                                                      max_bytes=max_bytes))
+
+def get_download_index():
+    """Process-wide download index shared by all sessions."""
+    return _get_shared('index', lambda: DownloadIndex(os.path.join(get_cache_folder(), "downloads.json")))
+
+def get_info_cache():
+    """Process-wide info cache shared by all sessions."""
+    return _get_shared('info', lambda: InfoCache(os.path.join(get_cache_folder(), "info")))
+
+def cache_video_info(url, info):
+    """Store an extracted info dict in the info cache, keyed by video ID.
+
+    The format selection is dropped, so every request selects its own
+    formats from the cached list.
+    """
+    import yt_dlp
+
+    video_id = extract_video_id(url) or info.get('id')
+    if video_id:
+        get_info_cache().put(video_id, strip_format_selection(yt_dlp.YoutubeDL.sanitize_info(info)))
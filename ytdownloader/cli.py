@@ -0,0 +1,236 @@
+"""Command-line interface for scripted and bulk use.
+
+    python -m ytdownloader info URL
+    python -m ytdownloader download URL [--audio [--mp3]] [--start 1:30 --end 2:00]
+    python -m ytdownloader clips URL --segments clips.csv [--accurate] [--zip]
+    python -m ytdownloader batch URL ... [--file urls.txt] [--workers 4]
+    python -m ytdownloader cache-stats
+    python -m ytdownloader serve [--host 0.0.0.0] [--port 8765]
+"""
+
+import argparse
+import json
+import sys
+
+from .utils import format_bytes, get_downloads_folder
+
+def _print_progress(event):
+    """Single-line progress display on stderr."""
+    if event.get('plan'):
+        sys.stderr.write(f"\r\033[KPlan: {event['plan']['summary']}\n")
+    parts = [event.get('phase') or '']
+    if event.get('downloaded_bytes') is not None and event.get('total_bytes'):
+        parts.append(f"{format_bytes(event['downloaded_bytes'])} / {format_bytes(event['total_bytes'])}")
+    if event.get('speed'):
+        parts.append(f"{format_bytes(event['speed'])}/s")
+    if event.get('eta') is not None:
+        parts.append(f"ETA {int(event['eta'])}s")
+    if event.get('total') and event.get('completed') is not None:
+        parts.append(f"{event['completed']}/{event['total']} items")
+    sys.stderr.write("\r\033[K" + "  ".join(parts))
+    sys.stderr.flush()
+
+def _finish(success, result):
+    sys.stderr.write("\r\033[K")
+    if not success:
+        print(f"Error: {result}", file=sys.stderr)
+        return 1
+    if isinstance(result, list):
+        for path in result:
+            print(path)
+    else:
+        print(result)
+    return 0
+
+def cmd_info(args):
+    from .formats import plan_formats
+    from .info import get_video_info
+    from .urls import clean_youtube_url
+
+    success, info = get_video_info(clean_youtube_url(args.url))
+    if not success:
+        print(f"Error: {info}", file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(info, default=str))
+    else:
+        duration = info.get('duration') or 0
+        print(f"Title:    {info.get('title', 'Unknown')}")
+        print(f"Duration: {int(duration) // 60}:{int(duration) % 60:02d}")
+        print(f"Uploader: {info.get('uploader', 'Unknown')}")
+        print(f"Chapters: {len(info.get('chapters') or [])}")
+        plan = plan_formats(info)
+        if plan:
+            print(f"Plan:     {plan['summary']}")
+    return 0
+
+def cmd_download(args):
+    from .download import download_video
+    from .segments import parse_time_to_seconds
+    from .urls import clean_youtube_url
+
+    start_time = parse_time_to_seconds(args.start) if args.start else None
+    end_time = parse_time_to_seconds(args.end) if args.end else None
+    if (start_time is None) != (end_time is None):
+        print("Error: --start and --end must be given together", file=sys.stderr)
+        return 2
+
+    success, result, _, _ = download_video(
+        clean_youtube_url(args.url), args.output, start_time, end_time,
+        audio_only=args.audio,
+        audio_format='mp3' if args.mp3 else 'native',
+        range_fetch=not args.no_range_fetch,
+        parallel_fetch=not args.no_parallel_fetch,
+        max_height=args.max_height,
+        max_bitrate=args.max_bitrate,
+        cache_source=args.keep_source,
+        progress_callback=None if args.quiet else _print_progress,
+    )
+    return _finish(success, result)
+
+def cmd_clips(args):
+    from .download import download_clips
+    from .segments import parse_segments
+    from .urls import clean_youtube_url
+
+    segments = None
+    if args.segments:
+        with open(args.segments, 'r', encoding='utf-8') as f:
+            segments = parse_segments(f.read())
+        if not segments:
+            print(f"Error: no segments found in {args.segments}", file=sys.stderr)
+            return 2
+
+    success, result, _, _ = download_clips(
+        clean_youtube_url(args.url), args.output, segments,
+        accurate=args.accurate,
+        zip_output=args.zip,
+        progress_callback=None if args.quiet else _print_progress,
+    )
+    return _finish(success, result)
+
+def cmd_batch(args):
+    from .batch import BatchDownloader, read_url_list
+
+    urls = list(args.urls)
+    if args.file:
+        with open(args.file, 'r', encoding='utf-8') as f:
+            urls += read_url_list(f.read())
+    if not urls:
+        print("Error: no URLs given", file=sys.stderr)
+        return 2
+
+    batch = BatchDownloader(
+        args.output,
+        max_workers=args.workers,
+        per_host_limit=args.per_host,
+        max_retries=args.retries,
+        audio_only=args.audio,
+        audio_format='mp3' if args.mp3 else 'native',
+    )
+    batch.start(urls)
+    items = batch.wait()
+
+    failed = 0
+    for item in items:
+        if item['status'] == 'done':
+            print(f"done\t{item['result']}")
+        else:
+            failed += 1
+            print(f"failed\t{item['url']}\t{item['error']}")
+    if batch.resolve_error:
+        print(f"Error: could not resolve all URLs: {batch.resolve_error}", file=sys.stderr)
+        return 1
+    return 1 if failed else 0
+
+def cmd_cache_stats(args):
+    from .cache import get_info_cache, get_source_cache
+
+    print(json.dumps({
+        'info': get_info_cache().stats(),
+        'sources': get_source_cache().stats(),
+    }, indent=2))
+    return 0
+
+def cmd_serve(args):
+    import logging
+
+    from .stream import make_stream_server
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    server = make_stream_server(args.host, args.port)
+    print(f"Streaming on http://{args.host}:{server.server_port}/stream?url=...", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="ytdownloader",
+        description="Download, trim and clip YouTube videos without the web interface.",
+    )
+    parser.add_argument('--events', metavar='FILE', help="append JSON timing events to FILE ('-' for stderr)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    info = subparsers.add_parser('info', help="show video information")
+    info.add_argument('url')
+    info.add_argument('--json', action='store_true', help="print the full info dict as JSON")
+    info.set_defaults(func=cmd_info)
+
+    download = subparsers.add_parser('download', help="download a video, audio track or clip")
+    download.add_argument('url')
+    download.add_argument('-o', '--output', default=get_downloads_folder(), help="output folder")
+    download.add_argument('--audio', action='store_true', help="audio only, in its original codec")
+    download.add_argument('--mp3', action='store_true', help="with --audio: convert to 320 kbps MP3")
+    download.add_argument('--start', help="clip start (SS, MM:SS or HH:MM:SS)")
+    download.add_argument('--end', help="clip end (SS, MM:SS or HH:MM:SS)")
+    download.add_argument('--keep-source', action='store_true', help="keep the full source cached for more clips")
+    download.add_argument('--no-range-fetch', action='store_true', help="download the full source before trimming")
+    download.add_argument('--max-height', type=int, help="highest video resolution, e.g. 720")
+    download.add_argument('--max-bitrate', type=int, help="highest total bitrate in kbps")
+    download.add_argument('--no-parallel-fetch', action='store_true',
+                          help="download over a single connection with yt-dlp")
+    download.add_argument('-q', '--quiet', action='store_true', help="no progress output")
+    download.set_defaults(func=cmd_download)
+
+    clips = subparsers.add_parser('clips', help="extract many clips from one video")
+    clips.add_argument('url')
+    clips.add_argument('--segments', help="segment list (lines, CSV or JSON); default: the video's chapters")
+    clips.add_argument('-o', '--output', default=get_downloads_folder(), help="output folder")
+    clips.add_argument('--accurate', action='store_true', help="frame-accurate cuts")
+    clips.add_argument('--zip', action='store_true', help="collect the clips into a zip archive")
+    clips.add_argument('-q', '--quiet', action='store_true', help="no progress output")
+    clips.set_defaults(func=cmd_clips)
+
+    batch = subparsers.add_parser('batch', help="download many videos or playlists")
+    batch.add_argument('urls', nargs='*')
+    batch.add_argument('-f', '--file', help="text file with one URL per line")
+    batch.add_argument('-o', '--output', default=get_downloads_folder(), help="output folder")
+    batch.add_argument('--workers', type=int, default=4, help="concurrent downloads")
+    batch.add_argument('--per-host', type=int, help="concurrent downloads per host (default: --workers)")
+    batch.add_argument('--retries', type=int, default=3, help="attempts per item")
+    batch.add_argument('--audio', action='store_true', help="audio only, in its original codec")
+    batch.add_argument('--mp3', action='store_true', help="with --audio: convert to 320 kbps MP3")
+    batch.set_defaults(func=cmd_batch)
+
+    stats = subparsers.add_parser('cache-stats', help="show cache statistics")
+    stats.set_defaults(func=cmd_cache_stats)
+
+    serve = subparsers.add_parser('serve', help="stream videos and clips over HTTP without saving them")
+    serve.add_argument('--host', default='127.0.0.1', help="address to listen on")
+    serve.add_argument('--port', type=int, default=8765, help="port to listen on")
+    serve.set_defaults(func=cmd_serve)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.events:
+        from .metrics import log_events
+
+        log_events(args.events)
+    return args.func(args)
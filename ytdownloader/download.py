@@ -0,0 +1,690 @@
+"""Downloading full videos, clips and sources with yt-dlp and ffmpeg."""
+
+import copy
+import hashlib
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import (
+    cache_video_info, file_lock, get_download_index, get_info_cache, get_source_cache, strip_format_selection,
+)
+from .fetch import FetchError, fetch_url
+from .formats import capped_format_spec, plan_formats, record_throughput
+from .metrics import count, count_cache, phase, record_phase
+from .pool import get_ydl_pool
+from .singleflight import SingleFlight
+from .segments import chapters_to_segments
+from .trim import MP3_ENCODE_ARGS, audio_extension, extract_clips, trim_audio, trim_video
+from .urls import clean_youtube_url, extract_video_id
+from .utils import get_cache_folder, output_suffix, safe_filename, seconds_label
+
+# Protocols ffmpeg can seek into without fetching the whole stream: plain
+# HTTP(S) files are read with byte-range requests, HLS playlists by segment.
+RANGE_FETCH_PROTOCOLS = ('http', 'https', 'm3u8', 'm3u8_native')
+
+# Protocols the parallel chunked fetcher handles (single files, no fragments)
+PARALLEL_FETCH_PROTOCOLS = ('http', 'https')
+
+def get_selected_formats(info):
+    """Return the format dicts yt-dlp selected for an extracted info dict."""
+    # Merged downloads (video+audio) list each stream separately
+    requested = info.get('requested_formats')
+    if requested:
+        return list(requested)
+    if info.get('url'):
+        return [info]
+    return []
+
+def build_range_fetch_command(formats, start_time, end_time, output_path, audio_only=False, codec_args=None):
+    """Build the ffmpeg command that fetches only [start_time, end_time] of the given formats.
+
+    Streams are copied unless codec_args says otherwise.
+    """
+    cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error']
+    for fmt in formats:
+        headers = fmt.get('http_headers') or {}
+        if headers:
+            cmd += ['-headers', ''.join(f"{key}: {value}\r\n" for key, value in headers.items())]
+        # Seeking before -i makes ffmpeg jump to the keyframe preceding start_time
+        # and only request the bytes/segments it actually needs
+        cmd += ['-ss', str(start_time), '-i', fmt['url']]
+
+    if audio_only:
+        cmd += ['-map', '0:a:0', '-vn']
+    elif len(formats) > 1:
+        # Take video from the first stream that has it and audio from the first with audio
+        video_index = next((i for i, f in enumerate(formats) if f.get('vcodec') != 'none'), 0)
+        audio_index = next((i for i, f in enumerate(formats) if f.get('acodec') != 'none'), len(formats) - 1)
+        cmd += ['-map', f'{video_index}:v:0', '-map', f'{audio_index}:a:0?']
+    else:
+        cmd += ['-map', '0']
+
+    cmd += [
+        '-t', str(end_time - start_time),
+    ]
+    cmd += codec_args or ['-c', 'copy']
+    cmd += [
+        '-avoid_negative_ts', 'make_zero',
+        '-y',
+        output_path
+    ]
+    return cmd
+
+def download_section(info, output_path, start_time, end_time, audio_only=False, audio_format='native'):
+    """Fetch only the requested time range of a video instead of the whole file.
+
+    Audio is stream-copied in its native codec unless audio_format is 'mp3'.
+
+    Returns (success, output_path or error message).
+    """
+    formats = get_selected_formats(info)
+    if not formats:
+        return False, "No downloadable formats selected"
+    if any(f.get('protocol', 'https') not in RANGE_FETCH_PROTOCOLS for f in formats):
+        return False, "Selected formats do not support range fetching"
+
+    codec_args = MP3_ENCODE_ARGS if audio_only and audio_format == 'mp3' else None
+    cmd = build_range_fetch_command(formats, start_time, end_time, output_path, audio_only, codec_args)
+    with phase('download', method='range_fetch') as span:
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True)
+        except FileNotFoundError:
+            span.update(outcome='error', error="ffmpeg not found")
+            return False, "FFmpeg not found. Please install FFmpeg and add it to your PATH."
+
+        if result.returncode == 0 and os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+            span['bytes'] = os.path.getsize(output_path)
+            return True, output_path
+        span.update(outcome='error', error=result.stderr.strip()[-500:])
+
+    # Don't leave a partial clip behind
+    if os.path.exists(output_path):
+        try:
+            os.remove(output_path)
+        except OSError:
+            pass
+    return False, f"Range fetch failed: {result.stderr.strip()}"
+
+def fetch_formats(info, output_path, connections=None, progress_callback=None):
+    """Fetch the selected formats of info over parallel, resumable connections.
+
+    Each stream is split into byte-range chunks fetched over several
+    connections, and video and audio streams are fetched at the same time,
+    then merged into output_path without re-encoding. Interrupted fetches
+    resume from their journal on the next call.
+
+    Returns (success, output_path or error message).
+    """
+    formats = get_selected_formats(info)
+    if not formats:
+        return False, "No downloadable formats selected"
+    if any(f.get('protocol', 'https') not in PARALLEL_FETCH_PROTOCOLS or f.get('fragments') for f in formats):
+        return False, "Selected formats do not support parallel fetching"
+
+    if len(formats) == 1:
+        stream_paths = [output_path]
+    else:
+        base, _ = os.path.splitext(output_path)
+        stream_paths = [f"{base}.f{f.get('format_id')}.{f.get('ext') or 'part'}" for f in formats]
+
+    # Progress of all streams is reported as one download
+    totals = [f.get('filesize') or f.get('filesize_approx') or 0 for f in formats]
+    done = [0] * len(formats)
+    fetched = [0] * len(formats)
+    speeds = [0] * len(formats)
+
+    def stream_progress(i):
+        def on_progress(event):
+            done[i] = event['downloaded_bytes']
+            fetched[i] = event['fetched_bytes']
+            totals[i] = event['total_bytes']
+            speeds[i] = event['speed'] or 0
+            if progress_callback:
+                speed = sum(speeds) or None
+                remaining = sum(totals) - sum(done)
+                progress_callback({
+                    'downloaded_bytes': sum(done),
+                    'total_bytes': sum(totals),
+                    'speed': speed,
+                    'eta': remaining / speed if speed else None,
+                })
+        return on_progress
+
+    def fetch(i):
+        fmt = formats[i]
+        chunk_size = (fmt.get('downloader_options') or {}).get('http_chunk_size')
+        return fetch_url(
+            fmt['url'], stream_paths[i], total_bytes=fmt.get('filesize'),
+            headers=fmt.get('http_headers'), connections=connections, chunk_size=chunk_size,
+            identity=f"{info.get('id')}:{fmt.get('format_id')}", progress_callback=stream_progress(i),
+        )
+
+    with phase('download', method='parallel', streams=len(formats)) as span:
+        started = time.monotonic()
+        try:
+            with ThreadPoolExecutor(max_workers=len(formats)) as pool:
+                list(pool.map(fetch, range(len(formats))))
+        except (FetchError, OSError) as e:
+            # The caller falls back to yt-dlp
+            span.update(outcome='error', error=str(e))
+            return False, f"Parallel fetch failed: {e}"
+        # A resumed fetch only transfers the chunks that were still missing
+        span['bytes'] = sum(fetched)
+        record_throughput(sum(fetched), time.monotonic() - started)
+
+    if len(formats) == 1:
+        return True, output_path
+
+    cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error']
+    for path in stream_paths:
+        cmd += ['-i', path]
+    video_index = next((i for i, f in enumerate(formats) if f.get('vcodec') != 'none'), 0)
+    audio_index = next((i for i, f in enumerate(formats) if f.get('acodec') != 'none'), len(formats) - 1)
+    cmd += ['-map', f'{video_index}:v:0', '-map', f'{audio_index}:a:0?', '-c', 'copy', '-y', output_path]
+    with phase('merge', method='copy') as span:
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True)
+        except FileNotFoundError:
+            span.update(outcome='error', error="ffmpeg not found")
+            return False, "FFmpeg not found. Please install FFmpeg and add it to your PATH."
+        if result.returncode != 0 or not os.path.exists(output_path):
+            span.update(outcome='error', error=result.stderr.strip()[-500:])
+            return False, f"Merge failed: {result.stderr.strip()}"
+        span['bytes'] = os.path.getsize(output_path)
+
+    for path in stream_paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return True, output_path
+
+def _final_path(final_paths, info):
+    """Exact final path of a finished download, as reported by yt-dlp."""
+    # Prefer the path reported by the post hook, after post-processing
+    file_path = final_paths[-1] if final_paths else None
+    if not file_path:
+        downloads = info.get('requested_downloads') or []
+        file_path = downloads[-1].get('filepath') if downloads else None
+    if not file_path or not os.path.exists(file_path):
+        return None
+    return file_path
+
+def _trim_cached_source(source_cache, source_id, source_format, start_time, end_time,
+                        output_folder, video_id, format_key, video_title, duration, index, report,
+                        audio_format=None, name_suffix=None):
+    """Trim a clip out of a source held in the source cache.
+
+    audio_format ('native' or 'mp3') selects an audio-only trim, and
+    name_suffix goes into the clip's file name. Returns
+    None, without trimming, if the source is no longer in the cache.
+    """
+    # Look the source up under a shared lock, which keeps it from being
+    # evicted between the lookup and the end of the trim
+    with source_cache.lock(source_id, source_format, shared=True):
+        source_path = source_cache.get(source_id, source_format, count=False)
+        if not source_path:
+            return None
+        report('trim')
+        if audio_format:
+            trimmed_path = trim_audio(source_path, start_time, end_time, video_title, output_folder,
+                                      to_mp3=audio_format == 'mp3', name_suffix=name_suffix)
+        else:
+            trimmed_path = trim_video(source_path, start_time, end_time, video_title, output_folder,
+                                      progress_callback=lambda event: report(**event),
+                                      name_suffix=name_suffix)
+    if not trimmed_path:
+        return False, "Failed to trim video", video_title, duration
+    index.add(video_id, format_key, trimmed_path, video_title, duration)
+    return True, trimmed_path, video_title, duration
+
+def _progress_reporter(progress_callback):
+    """Return (report, progress hook, postprocessor hook) feeding progress_callback."""
+    def report(phase, **fields):
+        if progress_callback:
+            progress_callback(dict(fields, phase=phase))
+
+    def on_progress(d):
+        if d.get('status') == 'downloading':
+            report(
+                'download',
+                downloaded_bytes=d.get('downloaded_bytes'),
+                total_bytes=d.get('total_bytes') or d.get('total_bytes_estimate'),
+                speed=d.get('speed'),
+                eta=d.get('eta'),
+            )
+
+    # Start times of yt-dlp's post-processors, to time them
+    postprocess_started = {}
+
+    def on_postprocess(d):
+        name = 'merge' if d.get('postprocessor') == 'Merger' else 'postprocess'
+        if d.get('status') == 'started':
+            postprocess_started[d.get('postprocessor')] = time.monotonic()
+            report(name)
+        elif d.get('status') == 'finished' and d.get('postprocessor') in postprocess_started:
+            record_phase(name, time.monotonic() - postprocess_started.pop(d.get('postprocessor')),
+                         method=d.get('postprocessor'))
+
+    return report, on_progress, on_postprocess
+
+def ydl_options(audio_only, audio_format='native', raw_source=False):
+    """Return (pool profile, yt-dlp options) for a video or audio download.
+
+    Audio is kept in its native codec (remuxed into a matching container)
+    unless audio_format is 'mp3'. raw_source skips audio post-processing
+    entirely, for sources that go to the source cache. The output template
+    and hooks are per job and are applied on pool checkout.
+    """
+    if audio_only:
+        if raw_source:
+            profile = 'audio-raw'
+            postprocessors = []
+        elif audio_format == 'mp3':
+            profile = 'audio-mp3'
+            postprocessors = [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'mp3',
+                'preferredquality': '320',
+            }]
+        else:
+            profile = 'audio'
+            # 'best' copies the stream (m4a stays m4a, opus goes to .opus)
+            postprocessors = [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'best',
+            }]
+        ydl_opts = {
+            'format': 'bestaudio[ext=m4a]/bestaudio/best',
+            'noplaylist': True,
+            'writesubtitles': False,
+            'writeautomaticsub': False,
+            'ignoreerrors': False,
+            'no_warnings': False,
+            'extract_flat': False,
+            'postprocessors': postprocessors,
+        }
+    else:
+        profile = 'video'
+        ydl_opts = {
+            'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
+            'merge_output_format': 'mp4',
+            'noplaylist': True,
+            'writesubtitles': False,
+            'writeautomaticsub': False,
+            'ignoreerrors': False,
+            'no_warnings': False,
+            'extract_flat': False,
+        }
+    return profile, ydl_opts
+
+def resolve_info(ydl, url, video_id, plan_options=None):
+    """Return (info dict with formats selected for this ydl, format plan or None).
+
+    ydl is a YoutubeDL checked out of the pool (see get_ydl_pool) with a
+    profile from ydl_options. With plan_options (keyword arguments for
+    plan_formats), the formats are picked by the format planner; the ydl's
+    own format string, narrowed to the plan's caps, is only used when no
+    planned format fits.
+    """
+    # Reuse cached info when its format URLs are still valid, otherwise
+    # extract it once and cache it for the next request
+    cached = get_info_cache().get(video_id, need_formats=True) if video_id else None
+    with phase('extract', cache='hit' if cached else 'miss', video_id=video_id) as span:
+        if cached:
+            # Entries cached before selection keys were dropped may still hold them
+            ie_result = strip_format_selection(copy.deepcopy(cached))
+        else:
+            ie_result = ydl.extract_info(url, download=False, process=False)
+
+        plan = plan_formats(ie_result, **plan_options) if plan_options is not None else None
+        capped = False
+        if plan:
+            # The pool restores the profile's own selector when the ydl is returned
+            ydl.format_selector = ydl.build_format_selector(plan['format'])
+            span['format'] = plan['format']
+        elif plan_options:
+            # The fallback must not ignore the caps the output is named after
+            max_height = None if plan_options.get('audio_only') else plan_options.get('max_height')
+            format_spec = capped_format_spec(ydl.params.get('format') or 'best', max_height,
+                                             plan_options.get('max_bitrate'))
+            if format_spec != ydl.params.get('format'):
+                ydl.format_selector = ydl.build_format_selector(format_spec)
+                span['format'] = format_spec
+                capped = True
+        # Run format selection with this download's options (no network)
+        try:
+            info = ydl.process_ie_result(ie_result, download=False)
+        except Exception as e:
+            if capped and 'Requested format is not available' in str(e):
+                raise ValueError("No format matches the requested limits") from e
+            raise
+        if not cached:
+            cache_video_info(url, info)
+    return info, plan
+
+def _download_info(ydl, info, final_paths, report, parallel_fetch=True):
+    """Download the formats selected in info; return the final path or None.
+
+    With parallel_fetch, plain HTTP(S) formats go through the chunked
+    fetcher; anything else, or a failed parallel fetch, goes through yt-dlp.
+    Only use parallel_fetch for options without post-processors, since the
+    fetcher bypasses them.
+    """
+    report('download')
+    file_path = None
+    if parallel_fetch:
+        # fetch_formats records its own throughput, counting only the bytes it fetched
+        fetched, result = fetch_formats(info, ydl.prepare_filename(info),
+                                        progress_callback=lambda event: report('download', **event))
+        if fetched:
+            file_path = result
+    if not file_path:
+        # Includes yt-dlp's merge and post-processing, which are also timed on their own
+        with phase('download', method='yt-dlp') as span:
+            started = time.monotonic()
+            info = ydl.process_ie_result(info, download=True)
+            file_path = _final_path(final_paths, info)
+            if file_path:
+                span['bytes'] = os.path.getsize(file_path)
+                # Keeps the planner's time estimates in line with the real bandwidth
+                record_throughput(span['bytes'], time.monotonic() - started)
+            else:
+                span.update(outcome='error', error="output file not found")
+    return file_path
+
+def _fetch_source(ydl, info, source_cache, final_paths, report, parallel_fetch=True):
+    """Make sure the full source is in the source cache; return its path or None.
+
+    Concurrent requests for the same source (e.g. different trims of one
+    video) share a single fetch.
+    """
+    source_id = info.get('id')
+    source_format = info.get('format_id') or 'default'
+    return _source_flights.do(
+        (source_id, source_format),
+        lambda progress: _fetch_source_locked(ydl, info, source_cache, final_paths, report,
+                                              source_id, source_format, parallel_fetch),
+    )
+
+def _fetch_source_locked(ydl, info, source_cache, final_paths, report, source_id, source_format,
+                         parallel_fetch):
+    # The file lock covers other processes sharing the cache
+    with source_cache.lock(source_id, source_format):
+        # Another worker or process may have fetched it while we waited
+        file_path = source_cache.get(source_id, source_format, count=False)
+        if not file_path:
+            file_path = _download_info(ydl, info, final_paths, report, parallel_fetch)
+            if file_path:
+                source_cache.added(file_path)
+    return file_path
+
+def source_output_template(source_cache):
+    """yt-dlp output template that writes into the source cache."""
+    return os.path.join(source_cache.folder, '%(id)s', '%(format_id)s.%(ext)s')
+
+# Name marker of the track an MP3 download is converted from
+MP3_SOURCE_MARKER = '.mp3src'
+
+# Identical in-flight requests, and fetches of the same source, share one run
+_download_flights = SingleFlight()
+_source_flights = SingleFlight()
+
+def _format_key(start_time=None, end_time=None, audio_only=False, audio_format='native',
+                max_height=None, max_bitrate=None):
+    """Output profile of a request: format, quality caps and trim range.
+
+    Built from the same normalised values as the file name (see
+    output_suffix), so requests that write the same file share a key.
+    """
+    if audio_only:
+        format_key = 'mp3' if audio_format == 'mp3' else 'audio'
+    else:
+        format_key = 'mp4'
+    if max_height and not audio_only:
+        format_key += f"~{max_height}p"
+    if max_bitrate:
+        format_key += f"~{max_bitrate}k"
+    if start_time is not None and end_time is not None:
+        format_key += f"@{seconds_label(start_time)}-{seconds_label(end_time)}"
+    return format_key
+
+def request_key(url, output_folder, start_time=None, end_time=None, audio_only=False, audio_format='native',
+                max_height=None, max_bitrate=None):
+    """Key shared by identical download requests: video ID, format profile, trim range and folder."""
+    video_id = extract_video_id(url) or clean_youtube_url(url)
+    format_key = _format_key(start_time, end_time, audio_only, audio_format, max_height, max_bitrate)
+    return f"{video_id}|{format_key}|{os.path.abspath(output_folder)}"
+
+def download_video(url, output_folder, start_time=None, end_time=None, audio_only=False, range_fetch=True,
+                   progress_callback=None, cache_source=False, audio_format='native', parallel_fetch=True,
+                   max_height=None, max_bitrate=None):
+    """Download YouTube video using yt-dlp with specified options.
+
+    Identical concurrent requests (same video, format profile, trim range
+    and output folder) are coalesced: they attach to the run already in
+    flight and all receive its result, and a lock file keeps other
+    processes from writing the same output at the same time.
+
+    Audio-only downloads and clips keep the native m4a/opus stream without
+    transcoding; pass audio_format='mp3' to get a 320 kbps MP3 instead.
+
+    When a time range is given, the clip is cut from the local source cache
+    if the source is already there. Otherwise, with range_fetch enabled, only
+    the bytes covering that range are fetched. Falling back (or with
+    cache_source=True) the full source is downloaded into the source cache
+    so later clips from the same video don't download it again.
+
+    With parallel_fetch, full videos and sources are fetched over several
+    connections per stream, video and audio at the same time, and an
+    interrupted download resumes where it stopped on the next request.
+
+    Formats are chosen by the format planner (see plan_formats), capped at
+    max_height pixels and max_bitrate kbps if given.
+
+    progress_callback, if given, is called with a dict holding the current
+    'phase' (extract, plan, download, merge, postprocess, trim). The plan
+    phase carries the chosen 'plan' with its estimated bytes and time;
+    while downloading the dict has 'downloaded_bytes', 'total_bytes',
+    'speed' and 'eta'.
+    """
+    key = request_key(url, output_folder, start_time, end_time, audio_only, audio_format,
+                      max_height, max_bitrate)
+
+    def run(progress):
+        lock_name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        with phase('request', key=key) as span:
+            with file_lock(os.path.join(get_cache_folder(), "locks", f"{lock_name}.lock")):
+                result = _download_video(url, output_folder, start_time, end_time, audio_only, range_fetch,
+                                         progress, cache_source, audio_format, parallel_fetch,
+                                         max_height, max_bitrate, span)
+            if not result[0]:
+                span.update(outcome='error', error=result[1])
+            return result
+
+    if _download_flights.in_flight(key):
+        count('ytdl_coalesced_requests_total')
+    return _download_flights.do(key, run, progress_callback)
+
+def _download_video(url, output_folder, start_time, end_time, audio_only, range_fetch,
+                    progress_callback, cache_source, audio_format, parallel_fetch,
+                    max_height, max_bitrate, span):
+    """Body of download_video; span['method'] is set to the path that served the request."""
+    report, on_progress, on_postprocess = _progress_reporter(progress_callback)
+    if audio_only:
+        # Audio has no height; it must not change the file name either
+        max_height = None
+
+    # Skip the download entirely if this exact output already exists
+    # (this also catches a run another process finished while we waited)
+    video_id = extract_video_id(url)
+    format_key = _format_key(start_time, end_time, audio_only, audio_format, max_height, max_bitrate)
+    index = get_download_index()
+    if video_id:
+        entry = index.get(video_id, format_key, output_folder)
+        count_cache('download_index', entry is not None)
+        if entry:
+            span['method'] = 'index'
+            return True, entry['path'], entry['title'], entry['duration']
+
+    # yt-dlp calls post hooks with the final path once post-processing is done
+    final_paths = []
+
+    # Full sources for trimming go to the source cache, not the Downloads folder
+    trimming = start_time is not None and end_time is not None
+    source_cache = get_source_cache()
+    if trimming:
+        output_template = source_output_template(source_cache)
+    else:
+        # Requests with other quality caps get their own file name
+        name_suffix = output_suffix(max_height=max_height, max_bitrate=max_bitrate)
+        if audio_only and audio_format == 'mp3':
+            # yt-dlp converts the downloaded track and deletes it, so it must
+            # not share its name with an Original audio download
+            name_suffix += MP3_SOURCE_MARKER
+        output_template = os.path.join(output_folder, f"%(title)s{name_suffix}.%(ext)s")
+    profile, ydl_opts = ydl_options(audio_only, audio_format=audio_format, raw_source=trimming)
+    clip_audio = audio_format if audio_only else None
+    # Clips are named after their range and caps, so different clips of one
+    # video never write the same file
+    clip_suffix = output_suffix(start_time, end_time, max_height, max_bitrate)
+    
+    try:
+        report('extract')
+        with get_ydl_pool().checkout(profile, ydl_opts, outtmpl=output_template,
+                                     progress_hooks=[on_progress], postprocessor_hooks=[on_postprocess],
+                                     post_hooks=[final_paths.append]) as ydl:
+            info, plan = resolve_info(ydl, url, video_id, {
+                'audio_only': audio_only,
+                'audio_format': audio_format,
+                'max_height': max_height,
+                'max_bitrate': max_bitrate,
+            })
+            if plan:
+                report('plan', plan=plan)
+            video_id = video_id or info.get('id')
+            video_title = info.get('title', 'Unknown')
+            duration = info.get('duration', 0)
+            
+            # Check if video formats are available
+            formats = info.get('formats', [])
+            video_formats = [f for f in formats if f.get('vcodec') != 'none']
+            
+            if not video_formats:
+                return False, "No video formats available for this URL", None, duration
+
+            source_id = info.get('id') or video_id
+            source_format = info.get('format_id') or 'default'
+
+            # Repeated clips from one video are cut from the cached source
+            if trimming and source_cache.get(source_id, source_format):
+                result = _trim_cached_source(
+                    source_cache, source_id, source_format, start_time, end_time,
+                    output_folder, video_id, format_key, video_title, duration, index, report,
+                    audio_format=clip_audio, name_suffix=clip_suffix
+                )
+                # None: evicted since the lookup, so fetch it like a miss
+                if result:
+                    span['method'] = 'source_cache'
+                    return result
+
+            # For clips, try to fetch just the requested range first
+            if trimming and range_fetch and not cache_source:
+                if not audio_only:
+                    clip_extension = 'mp4'
+                elif audio_format == 'mp3':
+                    clip_extension = 'mp3'
+                else:
+                    clip_extension = audio_extension(info.get('acodec'))
+                clip_name = f"{safe_filename(video_title)}_clip{clip_suffix}.{clip_extension}"
+                clip_path = os.path.join(output_folder, clip_name)
+                report('download')
+                fetched, clip_result = download_section(info, clip_path, start_time, end_time, audio_only,
+                                                        audio_format)
+                if fetched:
+                    span['method'] = 'range_fetch'
+                    index.add(video_id, format_key, clip_result, video_title, duration)
+                    return True, clip_result, video_title, duration
+
+            if trimming:
+                span['method'] = 'source_fetch'
+                file_path = _fetch_source(ydl, info, source_cache, final_paths, report, parallel_fetch)
+                if not file_path:
+                    return False, "Video downloaded but output file not found", video_title, duration
+                result = _trim_cached_source(
+                    source_cache, source_id, source_format, start_time, end_time,
+                    output_folder, video_id, format_key, video_title, duration, index, report,
+                    audio_format=clip_audio, name_suffix=clip_suffix
+                )
+                return result or (False, "Source was evicted from the cache before it could be trimmed",
+                                  video_title, duration)
+
+            # Download the video from the already-extracted info; audio
+            # downloads need yt-dlp's post-processing
+            span['method'] = 'full'
+            file_path = _download_info(ydl, info, final_paths, report, parallel_fetch and not audio_only)
+            if not file_path:
+                return False, "Video downloaded but output file not found", video_title, duration
+            base, extension = os.path.splitext(file_path)
+            if base.endswith(MP3_SOURCE_MARKER):
+                # The MP3 keeps the intermediate's name; drop the marker
+                final_path = base[:-len(MP3_SOURCE_MARKER)] + extension
+                os.replace(file_path, final_path)
+                file_path = final_path
+
+            index.add(video_id, format_key, file_path, video_title, duration)
+            return True, file_path, video_title, duration
+                
+    except Exception as e:
+        span['error_type'] = type(e).__name__
+        return False, f"Download failed: {str(e)}", None, 0
+
+def download_clips(url, output_folder, segments=None, accurate=False, zip_output=False, progress_callback=None):
+    """Download a video's source once and extract many clips from it.
+
+    If segments is None, the video's own chapters are used. The source is
+    kept in the source cache, so further clip lists from the same video
+    don't download it again.
+
+    Returns (success, clip paths / zip path or error message, title, duration).
+    """
+    report, on_progress, on_postprocess = _progress_reporter(progress_callback)
+    final_paths = []
+    source_cache = get_source_cache()
+    profile, ydl_opts = ydl_options(False)
+
+    try:
+        report('extract')
+        with get_ydl_pool().checkout(profile, ydl_opts, outtmpl=source_output_template(source_cache),
+                                     progress_hooks=[on_progress], postprocessor_hooks=[on_postprocess],
+                                     post_hooks=[final_paths.append]) as ydl:
+            info, plan = resolve_info(ydl, url, extract_video_id(url), {})
+            if plan:
+                report('plan', plan=plan)
+            video_title = info.get('title', 'Unknown')
+            duration = info.get('duration', 0)
+
+            if segments is None:
+                segments = chapters_to_segments(info)
+            if not segments:
+                return False, "No segments given and the video has no chapters", video_title, duration
+
+            source_id = info.get('id')
+            source_format = info.get('format_id') or 'default'
+            if not source_cache.get(source_id, source_format):
+                if not _fetch_source(ydl, info, source_cache, final_paths, report):
+                    return False, "Video downloaded but output file not found", video_title, duration
+
+        # Re-check under the shared lock: the source may have been evicted meanwhile
+        with source_cache.lock(source_id, source_format, shared=True):
+            source_path = source_cache.get(source_id, source_format, count=False)
+            if not source_path:
+                return False, "Source was evicted from the cache before the clips were cut", video_title, duration
+            report('trim', completed=0, total=len(segments))
+            success, result = extract_clips(source_path, segments, video_title, output_folder,
+                                            accurate=accurate, zip_output=zip_output)
+        return success, result, video_title, duration
+    except Exception as e:
+        return False, f"Clip extraction failed: {str(e)}", None, 0
@@ -0,0 +1,203 @@
+"""Multi-connection, resumable HTTP fetching of media files.
+
+A file is split into byte-range chunks that are fetched over several
+connections straight into a preallocated ``.partial`` file. Finished chunks
+are recorded in a journal next to it, so an interrupted fetch (a crash or
+a restart of the app) only fetches the chunks that are still missing.
+"""
+
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# yt-dlp uses the same chunk size for YouTube; larger single requests get throttled
+DEFAULT_CHUNK_SIZE = 10 * 1024 * 1024
+DEFAULT_CONNECTIONS = int(os.environ.get('YTDL_FETCH_CONNECTIONS', 4))
+
+READ_SIZE = 64 * 1024
+
+class FetchError(Exception):
+    """A URL could not be fetched in parallel (no size, no range support, too many failures)."""
+
+class ChunkJournal:
+    """Record of the finished chunks of a partial file, kept as JSON.
+
+    identity describes the content (e.g. format ID and size) rather than
+    the URL, since media URLs expire and a resumed fetch gets a fresh one.
+    A journal written for different content or chunking is ignored.
+    """
+
+    def __init__(self, path, total_bytes, chunk_size, identity=None):
+        self.path = path
+        self.total_bytes = total_bytes
+        self.chunk_size = chunk_size
+        self.identity = identity
+        self.done = set()
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Load finished chunks from disk; return how many were found."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if (data.get('total_bytes'), data.get('chunk_size'), data.get('identity')) != \
+                (self.total_bytes, self.chunk_size, self.identity):
+            return 0
+        self.done = set(data.get('done') or [])
+        return len(self.done)
+
+    def mark(self, index):
+        """Record chunk index as finished."""
+        with self._lock:
+            self.done.add(index)
+            data = {
+                'total_bytes': self.total_bytes,
+                'chunk_size': self.chunk_size,
+                'identity': self.identity,
+                'done': sorted(self.done),
+            }
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+def _request(url, headers, start=None, end=None, timeout=30):
+    request = urllib.request.Request(url, headers=dict(headers or {}))
+    if start is not None:
+        request.add_header('Range', f"bytes={start}-{end}")
+    return urllib.request.urlopen(request, timeout=timeout)
+
+def probe_size(url, headers=None, timeout=30):
+    """Total size of url from a one-byte range request, or None without range support."""
+    try:
+        with _request(url, headers, 0, 0, timeout) as response:
+            content_range = response.headers.get('Content-Range') or ''
+            if response.status != 206 or '/' not in content_range:
+                return None
+            total = content_range.rsplit('/', 1)[1]
+            return int(total) if total.isdigit() else None
+    except (OSError, ValueError):
+        return None
+
+def _preallocate(path, total_bytes):
+    """Create path (or keep an existing partial file) at its full size."""
+    mode = 'r+b' if os.path.exists(path) else 'wb'
+    with open(path, mode) as f:
+        if os.fstat(f.fileno()).st_size != total_bytes:
+            f.truncate(total_bytes)
+        if hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(f.fileno(), 0, total_bytes)
+            except OSError:
+                # Not supported on every filesystem; the sparse file works too
+                pass
+
+def _fetch_chunk(url, headers, part_path, start, end, retries, timeout, on_bytes):
+    """Write bytes [start, end] of url into part_path, retrying on failure."""
+    for attempt in range(retries):
+        received = 0
+        try:
+            with _request(url, headers, start, end, timeout) as response:
+                if response.status != 206:
+                    raise FetchError("Server ignored the range request")
+                with open(part_path, 'r+b') as f:
+                    f.seek(start)
+                    while True:
+                        data = response.read(READ_SIZE)
+                        if not data:
+                            break
+                        f.write(data)
+                        received += len(data)
+                        on_bytes(len(data))
+            if received == end - start + 1:
+                return
+            error = FetchError(f"Short read: got {received} of {end - start + 1} bytes")
+        except FetchError:
+            raise
+        except (OSError, urllib.error.URLError) as e:
+            error = e
+        # Only whole chunks are journaled, so a failed chunk starts over
+        on_bytes(-received)
+        if attempt < retries - 1:
+            time.sleep(min(2 ** attempt, 10))
+    raise FetchError(f"Chunk {start}-{end} failed after {retries} attempts: {error}")
+
+def fetch_url(url, output_path, total_bytes=None, headers=None, connections=None, chunk_size=None,
+              identity=None, retries=3, timeout=30, progress_callback=None):
+    """Fetch url into output_path over parallel range requests, resuming a previous attempt.
+
+    progress_callback, if given, is called with 'downloaded_bytes',
+    'total_bytes', 'speed' and 'eta' (the fields yt-dlp progress hooks use),
+    plus 'fetched_bytes': the bytes this call transferred, without the
+    chunks a previous attempt already finished.
+
+    Returns output_path. Raises FetchError when the server does not support
+    range requests or a chunk keeps failing; the partial file and journal
+    are kept so the next attempt resumes. Local file errors raise OSError.
+    """
+    connections = max(1, connections or DEFAULT_CONNECTIONS)
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    if not total_bytes:
+        total_bytes = probe_size(url, headers, timeout)
+    if not total_bytes:
+        raise FetchError("Unknown size or no range support")
+
+    part_path = f"{output_path}.partial"
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    journal = ChunkJournal(f"{part_path}.journal", total_bytes, chunk_size, identity)
+    if not os.path.exists(part_path) or not journal.load():
+        journal.done = set()
+    _preallocate(part_path, total_bytes)
+
+    chunks = [
+        (index, start, min(start + chunk_size, total_bytes) - 1)
+        for index, start in enumerate(range(0, total_bytes, chunk_size))
+        if index not in journal.done
+    ]
+    resumed = total_bytes - sum(end - start + 1 for _, start, end in chunks)
+
+    progress_lock = threading.Lock()
+    progress = {'downloaded': resumed, 'fetched': 0}
+    started = time.monotonic()
+
+    def on_bytes(count):
+        with progress_lock:
+            progress['downloaded'] += count
+            progress['fetched'] += count
+            downloaded, fetched = progress['downloaded'], progress['fetched']
+        if progress_callback:
+            elapsed = time.monotonic() - started
+            speed = fetched / elapsed if elapsed > 0 and fetched > 0 else None
+            progress_callback({
+                'downloaded_bytes': downloaded,
+                'fetched_bytes': fetched,
+                'total_bytes': total_bytes,
+                'speed': speed,
+                'eta': (total_bytes - downloaded) / speed if speed else None,
+            })
+
+    def fetch(chunk):
+        index, start, end = chunk
+        _fetch_chunk(url, headers, part_path, start, end, retries, timeout, on_bytes)
+        journal.mark(index)
+
+    if chunks:
+        with ThreadPoolExecutor(max_workers=min(connections, len(chunks))) as pool:
+            # list() re-raises the first chunk failure
+            list(pool.map(fetch, chunks))
+
+    os.replace(part_path, output_path)
+    journal.remove()
+    return output_path
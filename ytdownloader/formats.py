@@ -0,0 +1,231 @@
+"""Cost-aware format selection.
+
+Instead of a fixed yt-dlp format string, the planner looks at the formats
+an info dict already lists and picks the cheapest way to get the best
+quality allowed by the caps: a pre-muxed MP4 needs no merge, and only
+codecs the output container holds as-is are considered, so joining or
+rewrapping streams is always a stream copy rather than a re-encode.
+"""
+
+import os
+import threading
+
+from .utils import format_bytes
+
+# Codecs the mp4 container holds without re-encoding (yt-dlp codec prefixes)
+MP4_VIDEO_CODECS = ('avc1', 'h264', 'hvc1', 'hev1', 'hevc', 'av01')
+MP4_AUDIO_CODECS = ('mp4a', 'aac', 'mp3')
+
+# Assumed download throughput until a download has been measured
+DEFAULT_BANDWIDTH = float(os.environ.get('YTDL_BANDWIDTH', 5 * 1024 * 1024))
+# Local stream-copy throughput, plus a fixed cost per ffmpeg run
+COPY_RATE = 200 * 1024 * 1024
+COPY_OVERHEAD = 0.5
+# MP3 encoding speed, in seconds of audio per second
+MP3_ENCODE_SPEED = 50
+
+_bandwidth = None
+_bandwidth_lock = threading.Lock()
+
+def record_throughput(num_bytes, seconds):
+    """Feed a finished download into the bandwidth estimate."""
+    global _bandwidth
+    if not num_bytes or seconds <= 0:
+        return
+    rate = num_bytes / seconds
+    with _bandwidth_lock:
+        # Moving average, so one slow or fast download doesn't dominate
+        _bandwidth = rate if _bandwidth is None else 0.7 * _bandwidth + 0.3 * rate
+
+def estimated_bandwidth():
+    """Current download throughput estimate in bytes per second."""
+    with _bandwidth_lock:
+        return _bandwidth or DEFAULT_BANDWIDTH
+
+def _codec(fmt, key):
+    codec = fmt.get(key)
+    return codec.lower() if codec else None
+
+def _has_video(fmt):
+    vcodec = _codec(fmt, 'vcodec')
+    return vcodec != 'none' and (vcodec is not None or bool(fmt.get('height')))
+
+def _has_audio(fmt):
+    acodec = _codec(fmt, 'acodec')
+    return acodec != 'none' and (acodec is not None or not _has_video(fmt))
+
+def _mp4_compatible(codec, codecs):
+    return bool(codec) and codec.startswith(codecs)
+
+def estimate_bytes(fmt, duration):
+    """Size of a format from its reported size or bitrate, or None if unknown."""
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if size:
+        return int(size)
+    if fmt.get('tbr') and duration:
+        return int(fmt['tbr'] * 1000 / 8 * duration)
+    return None
+
+def _bitrate(fmt):
+    return fmt.get('tbr') or fmt.get('abr') or 0
+
+def _candidate(formats, step, duration, bandwidth):
+    """Cost of downloading the given formats and finishing them with step."""
+    sizes = [estimate_bytes(f, duration) for f in formats]
+    total = sum(sizes) if None not in sizes else None
+    seconds = None
+    if total is not None:
+        seconds = total / bandwidth
+        if step in ('merge', 'remux'):
+            seconds += total / COPY_RATE + COPY_OVERHEAD
+        elif step == 'transcode':
+            seconds += (duration or 0) / MP3_ENCODE_SPEED + COPY_OVERHEAD
+    video = next((f for f in formats if _has_video(f)), None)
+    audio = next((f for f in formats if _has_audio(f)), None)
+    return {
+        'format': '+'.join(str(f['format_id']) for f in formats),
+        'format_ids': [str(f['format_id']) for f in formats],
+        'premuxed': len(formats) == 1 and video is not None and audio is not None,
+        'postprocess': step,
+        'height': video.get('height') if video else None,
+        'fps': video.get('fps') if video else None,
+        'vcodec': _codec(video, 'vcodec') if video else None,
+        'acodec': _codec(audio, 'acodec') if audio else None,
+        'audio_bitrate': (audio.get('abr') or audio.get('tbr')) if audio and audio is not video else None,
+        'bitrate': sum(_bitrate(f) for f in formats) or None,
+        'estimated_bytes': total,
+        'estimated_seconds': seconds,
+    }
+
+def _within_caps(candidate, max_height, max_bitrate):
+    if max_height and candidate['height'] and candidate['height'] > max_height:
+        return False
+    if max_bitrate and candidate['bitrate'] and candidate['bitrate'] > max_bitrate:
+        return False
+    return True
+
+def _video_candidates(formats, duration, bandwidth):
+    premuxed = [f for f in formats if _has_video(f) and _has_audio(f)]
+    video_only = [f for f in formats if _has_video(f) and not _has_audio(f)]
+    audio_only = [f for f in formats if _has_audio(f) and not _has_video(f)
+                  and _mp4_compatible(_codec(f, 'acodec'), MP4_AUDIO_CODECS)]
+
+    # Pre-muxed formats are downloaded as they are, so only MP4s qualify
+    for fmt in premuxed:
+        if fmt.get('ext') == 'mp4' and _mp4_compatible(_codec(fmt, 'vcodec'), MP4_VIDEO_CODECS) and \
+                _mp4_compatible(_codec(fmt, 'acodec'), MP4_AUDIO_CODECS):
+            yield _candidate([fmt], 'none', duration, bandwidth)
+    for video in video_only:
+        if not _mp4_compatible(_codec(video, 'vcodec'), MP4_VIDEO_CODECS):
+            continue
+        for audio in audio_only:
+            yield _candidate([video, audio], 'merge', duration, bandwidth)
+
+def _audio_candidates(formats, audio_format, duration, bandwidth):
+    for fmt in formats:
+        if _has_audio(fmt) and not _has_video(fmt):
+            step = 'transcode' if audio_format == 'mp3' else 'remux'
+            candidate = _candidate([fmt], step, duration, bandwidth)
+            # AAC plays everywhere; other native codecs only win on quality
+            candidate['compatible'] = _mp4_compatible(candidate['acodec'], MP4_AUDIO_CODECS)
+            yield candidate
+
+def _best_audio_pairs(candidates):
+    """Keep only the best-sounding audio partner of each video-only format."""
+    best = {}
+    for c in candidates:
+        if c['premuxed']:
+            continue
+        video_id = c['format_ids'][0]
+        if video_id not in best or (c['audio_bitrate'] or 0) > (best[video_id]['audio_bitrate'] or 0):
+            best[video_id] = c
+    return [c for c in candidates if c['premuxed'] or best[c['format_ids'][0]] is c]
+
+def capped_format_spec(format_spec, max_height=None, max_bitrate=None):
+    """Add height and bitrate (kbps) filters to each format of a yt-dlp format string.
+
+    Audio-only selectors don't get the height filter. With no caps the
+    string is returned unchanged.
+    """
+    if not max_height and not max_bitrate:
+        return format_spec
+    alternatives = []
+    for alternative in format_spec.split('/'):
+        parts = []
+        for part in alternative.split('+'):
+            if max_height and 'audio' not in part:
+                part += f"[height<={max_height}]"
+            if max_bitrate:
+                part += f"[tbr<=?{max_bitrate}]"
+            parts.append(part)
+        alternatives.append('+'.join(parts))
+    return '/'.join(alternatives)
+
+def plan_summary(plan):
+    """One-line description of a plan for display."""
+    if plan['height']:
+        parts = [f"{plan['height']}p" + (f"{int(plan['fps'])}" if plan.get('fps') and plan['fps'] > 30 else "")]
+    else:
+        parts = [f"{int(plan['bitrate'])} kbps" if plan['bitrate'] else "audio"]
+    codecs = [c.split('.')[0] for c in (plan['vcodec'], plan['acodec']) if c]
+    parts.append(" + ".join(codecs) + f" (format {plan['format']})")
+    parts.append({
+        'none': "pre-muxed, no merge",
+        'merge': "stream-copy merge",
+        'remux': "remux",
+        'transcode': "MP3 encode",
+    }[plan['postprocess']])
+    if plan['estimated_bytes'] is not None:
+        parts.append(f"~{format_bytes(plan['estimated_bytes'])}")
+    if plan['estimated_seconds'] is not None:
+        parts.append(f"~{int(plan['estimated_seconds']) + 1} s")
+    return " · ".join(parts)
+
+def plan_formats(info, audio_only=False, audio_format='native', max_height=None, max_bitrate=None,
+                 bandwidth=None):
+    """Pick the formats to download from info['formats'] by a cost model.
+
+    Quality comes first: the highest resolution (then frame rate) within
+    max_height and max_bitrate (kbps), or for audio the highest bitrate.
+    A separate video stream is paired with the best audio stream that fits
+    the caps. Among equally good options the one with the lowest estimated
+    time wins, counting the download plus any merge, remux or MP3 encode,
+    so a pre-muxed format beats a video+audio pair that needs merging.
+
+    Returns a plan dict - 'format' (a yt-dlp format spec), 'postprocess',
+    'estimated_bytes', 'estimated_seconds', 'summary' and the chosen
+    codecs and resolution - or None if no format fits, in which case the
+    caller should fall back to its default format string.
+    """
+    formats = [f for f in info.get('formats') or [] if f.get('format_id')]
+    if not formats:
+        return None
+    duration = info.get('duration')
+    bandwidth = bandwidth or estimated_bandwidth()
+
+    if audio_only:
+        candidates = [c for c in _audio_candidates(formats, audio_format, duration, bandwidth)
+                      if _within_caps(c, None, max_bitrate)]
+        # MP3 is re-encoded anyway, so the source codec doesn't matter
+        quality = lambda c: (audio_format == 'mp3' or c['compatible'], c['bitrate'] or 0)
+    else:
+        candidates = [c for c in _video_candidates(formats, duration, bandwidth)
+                      if _within_caps(c, max_height, max_bitrate)]
+        quality = lambda c: (c['height'] or 0, min(c['fps'] or 0, 60) > 30)
+    if not candidates:
+        return None
+
+    best = max(quality(c) for c in candidates)
+    candidates = [c for c in candidates if quality(c) == best]
+    if not audio_only:
+        # Otherwise the smallest, worst audio stream wins on cost
+        candidates = _best_audio_pairs(candidates)
+    plan = min(
+        candidates,
+        key=lambda c: (c['estimated_seconds'] if c['estimated_seconds'] is not None else float('inf'),
+                       not c['premuxed']),
+    )
+    plan.pop('compatible', None)
+    plan.pop('audio_bitrate', None)
+    plan['summary'] = plan_summary(plan)
+    return plan
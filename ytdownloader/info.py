@@ -0,0 +1,66 @@
+"""Video information lookups."""
+
+from .cache import cache_video_info, get_info_cache
+from .pool import get_ydl_pool
+from .urls import extract_video_id
+
+def get_video_info(url):
+    """Get video information without downloading."""
+    ydl_opts = {
+        'quiet': False,  # Show warnings for debugging
+        'no_warnings': False,
+        'extract_flat': False,
+        'socket_timeout': 30,  # 30 second timeout
+        'retries': 3,  # Retry up to 3 times
+    }
+    
+    # Serve repeated lookups from the on-disk cache
+    video_id = extract_video_id(url)
+    if video_id:
+        cached = get_info_cache().get(video_id)
+        if cached:
+            return True, cached
+
+    try:
+        with get_ydl_pool().checkout('info', ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+            if info:
+                cache_video_info(url, info)
+                return True, info
+            else:
+                return False, "No video information found"
+    except Exception as e:
+        error_msg = str(e)
+        # Provide more specific error messages
+        if "Private video" in error_msg:
+            return False, "This video is private and cannot be accessed"
+        elif "Video unavailable" in error_msg:
+            return False, "This video is unavailable (may be deleted or restricted)"
+        elif "Sign in to confirm your age" in error_msg:
+            return False, "This video is age-restricted and requires sign-in"
+        elif "Video not available" in error_msg:
+            return False, "This video is not available in your region"
+        elif "HTTP Error 403" in error_msg:
+            return False, "Access denied - video may be restricted"
+        elif "HTTP Error 404" in error_msg:
+            return False, "Video not found - may be deleted or URL is incorrect"
+        elif "timeout" in error_msg.lower():
+            return False, "Request timed out - video may be unavailable or slow to load"
+        else:
+            return False, f"Error: {error_msg}"
+
+def get_download_plan(url, audio_only=False, audio_format='native', max_height=None, max_bitrate=None):
+    """Plan a download before starting it: formats, post-processing and estimated bytes/time.
+
+    Returns (success, plan dict or error message); see plan_formats.
+    """
+    from .formats import plan_formats
+
+    success, info = get_video_info(url)
+    if not success:
+        return False, info
+    plan = plan_formats(info, audio_only=audio_only, audio_format=audio_format,
+                        max_height=max_height, max_bitrate=max_bitrate)
+    if not plan:
+        return False, "No format matches the requested limits"
+    return True, plan
@@ -0,0 +1,115 @@
+"""Background job manager for downloads."""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+class JobManager:
+    """Run downloads outside the Streamlit script run.
+
+    One manager is shared by every session (see get_job_manager). Jobs are
+    identified by an ID; their state - status, phase, bytes, speed and ETA -
+    is updated from download progress callbacks and can be polled at any
+    time, even from a new session after a page refresh.
+
+    Jobs that mostly wait on workers of their own (batches) are submitted
+    with coordinator=True and run on a separate pool of max_coordinators
+    threads, so they never hold one of the max_workers download workers.
+    """
+
+    def __init__(self, max_workers=4, keep_finished=200, max_coordinators=4):
+        self.keep_finished = keep_finished
+        self._jobs = {}
+        self._active_keys = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._coordinators = ThreadPoolExecutor(max_workers=max_coordinators, thread_name_prefix="job-coordinator")
+
+    def submit(self, label, fn, *args, coalesce_key=None, coordinator=False, **kwargs):
+        """Run fn(*args, progress_callback=..., **kwargs) in the background; return the job ID.
+
+        If coalesce_key matches a job that is still queued or running, no new
+        job is started and that job's ID is returned instead. coordinator
+        selects the separate pool for jobs that run their own workers.
+        """
+        if coalesce_key is not None:
+            with self._lock:
+                if coalesce_key in self._active_keys:
+                    return self._active_keys[coalesce_key]
+
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            'id': job_id,
+            'label': label,
+            'status': 'queued',
+            'phase': None,
+            'downloaded_bytes': None,
+            'total_bytes': None,
+            'speed': None,
+            'eta': None,
+            'title': None,
+            'result': None,
+            'error': None,
+            'created': time.time(),
+            'finished': None,
+        }
+        with self._lock:
+            # Another session may have submitted the same request meanwhile
+            if coalesce_key is not None:
+                if coalesce_key in self._active_keys:
+                    return self._active_keys[coalesce_key]
+                self._active_keys[coalesce_key] = job_id
+            self._jobs[job_id] = job
+            self._prune()
+        executor = self._coordinators if coordinator else self._executor
+        executor.submit(self._run, job_id, fn, args, kwargs, coalesce_key)
+        return job_id
+
+    def _update(self, job_id, **changes):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(changes)
+
+    def _run(self, job_id, fn, args, kwargs, coalesce_key=None):
+        try:
+            self._execute(job_id, fn, args, kwargs)
+        finally:
+            if coalesce_key is not None:
+                with self._lock:
+                    self._active_keys.pop(coalesce_key, None)
+
+    def _execute(self, job_id, fn, args, kwargs):
+        self._update(job_id, status='running')
+
+        def on_progress(event):
+            self._update(job_id, **event)
+
+        try:
+            result = fn(*args, progress_callback=on_progress, **kwargs)
+        except Exception as e:
+            self._update(job_id, status='failed', error=str(e), finished=time.time())
+            return
+
+        # download_video style results: (success, path or error, title, duration)
+        if isinstance(result, tuple) and len(result) >= 3:
+            success, value, title = result[:3]
+            if success:
+                self._update(job_id, status='done', phase='done', result=value, title=title,
+                             finished=time.time())
+            else:
+                self._update(job_id, status='failed', error=value, title=title, finished=time.time())
+        else:
+            self._update(job_id, status='done', phase='done', result=result, finished=time.time())
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j['finished']]
+        if len(finished) > self.keep_finished:
+            for job in sorted(finished, key=lambda j: j['finished'])[:len(finished) - self.keep_finished]:
+                del self._jobs[job['id']]
+
+    def get(self, job_id):
+        """Return a copy of a job's state, or None if unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
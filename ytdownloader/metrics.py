@@ -0,0 +1,169 @@
+"""Per-phase timing, counters and a Prometheus text exporter.
+
+Every timed phase (extract, download, merge, trim, ...) is emitted as one
+JSON line on the ``ytdownloader.events`` logger and aggregated into
+in-process histograms and counters. ``render_prometheus()`` serves them in
+the Prometheus text format (see the /metrics path of the stream server).
+"""
+
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+event_logger = logging.getLogger('ytdownloader.events')
+
+# Seconds; phases range from cache lookups to long downloads and encodes
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# Span fields that become metric labels; everything else only goes to the log
+LABEL_FIELDS = ('method', 'cache')
+
+HELP = {
+    'ytdl_phase_seconds': "Duration of request phases.",
+    'ytdl_phase_bytes_total': "Bytes handled by request phases.",
+    'ytdl_ffmpeg_attempts_total': "Trim methods tried (smart cut, re-encode), counting fallbacks.",
+    'ytdl_cache_requests_total': "Cache lookups by cache and result.",
+    'ytdl_coalesced_requests_total': "Requests that attached to an identical request in flight.",
+}
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms keyed by name and labels."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def snapshot(self):
+        """Plain-dict copy of every metric, e.g. for JSON output."""
+        with self._lock:
+            return {
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                'histograms': [
+                    {'name': name, 'labels': dict(labels), 'sum': h['sum'], 'count': h['count'],
+                     'buckets': dict(zip(self.buckets, h['buckets']))}
+                    for (name, labels), h in sorted(self._histograms.items())
+                ],
+            }
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, dict(h, buckets=list(h['buckets']))) for key, h in self._histograms.items())
+        seen = set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), h in histograms:
+            header(name, 'histogram')
+            for bound, count in zip(self.buckets, h['buckets']):
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', str(bound))])} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {h['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {h['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {h['count']}")
+        return "\n".join(lines) + "\n"
+
+_registry = MetricsRegistry()
+
+def get_metrics():
+    """Process-wide metrics registry."""
+    return _registry
+
+def count(name, value=1, **labels):
+    """Increment a counter in the process-wide registry."""
+    _registry.inc(name, value, **labels)
+
+def count_cache(cache, hit):
+    """Record one cache lookup."""
+    _registry.inc('ytdl_cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+def record_phase(name, duration, outcome='ok', **fields):
+    """Record a finished phase: histogram, byte/attempt counters and a JSON log event."""
+    labels = {key: fields.get(key) for key in LABEL_FIELDS}
+    _registry.observe('ytdl_phase_seconds', duration, phase=name, outcome=outcome, **labels)
+    if fields.get('bytes'):
+        _registry.inc('ytdl_phase_bytes_total', fields['bytes'], phase=name, **labels)
+    if fields.get('attempts'):
+        _registry.inc('ytdl_ffmpeg_attempts_total', fields['attempts'], phase=name, **labels)
+    if event_logger.isEnabledFor(logging.INFO):
+        event = dict(fields, event='phase', phase=name, outcome=outcome, duration=round(duration, 4),
+                     ts=round(time.time(), 3))
+        event_logger.info(json.dumps(event, default=str))
+
+def log_events(target):
+    """Send the JSON phase events to a file, or to stderr if target is '-'."""
+    import sys
+
+    handler = logging.StreamHandler(sys.stderr) if target == '-' else logging.FileHandler(target)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    event_logger.addHandler(handler)
+    event_logger.setLevel(logging.INFO)
+    event_logger.propagate = False
+    return handler
+
+@contextmanager
+def phase(name, **fields):
+    """Time a block as one phase.
+
+    Yields a dict the block can add fields to: 'bytes', 'attempts',
+    'method' (e.g. the fallback path taken), 'cache' ('hit'/'miss') and any
+    free-form detail for the log. Set 'outcome' to 'error' (and 'error' to
+    the reason) for failures that don't raise; exceptions are recorded with
+    their type.
+    """
+    span = dict(fields)
+    started = time.monotonic()
+    try:
+        yield span
+    except BaseException as e:
+        span['outcome'] = 'error'
+        span.setdefault('error', type(e).__name__)
+        raise
+    finally:
+        outcome = span.pop('outcome', 'ok')
+        record_phase(name, time.monotonic() - started, outcome, **span)
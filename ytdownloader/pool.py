@@ -0,0 +1,137 @@
+"""Pool of warm, reusable YoutubeDL instances.
+
+Building a YoutubeDL sets up extractors, the cookie jar and the HTTP
+request handlers; reusing instances keeps all of that (and open keep-alive
+connections) across requests. Instances are pooled per option profile, and
+their per-job state is reset when they are returned.
+"""
+
+import copy
+import threading
+from contextlib import contextmanager
+
+# Hook lists YoutubeDL keeps outside of params
+_HOOK_ATTRS = ('_progress_hooks', '_postprocessor_hooks', '_post_hooks')
+
+class _PooledYDL:
+    """A YoutubeDL instance plus the pristine state to restore between jobs."""
+
+    def __init__(self, ydl):
+        self.ydl = ydl
+        self.params = copy.deepcopy(ydl.params)
+        self.hooks = {attr: list(getattr(ydl, attr, [])) for attr in _HOOK_ATTRS}
+        # add_postprocessor_hook also adds the hook to every registered postprocessor
+        self.pp_hooks = [
+            (pp, list(getattr(pp, '_progress_hooks', [])))
+            for pps in getattr(ydl, '_pps', {}).values() for pp in pps
+        ]
+        self.format_selector = getattr(ydl, 'format_selector', None)
+
+    def prepare(self, outtmpl=None, progress_hooks=(), postprocessor_hooks=(), post_hooks=()):
+        """Apply one job's output template and hooks."""
+        ydl = self.ydl
+        if outtmpl:
+            current = ydl.params.get('outtmpl')
+            ydl.params['outtmpl'] = dict(current if isinstance(current, dict) else {}, default=outtmpl)
+        for hook in progress_hooks:
+            ydl.add_progress_hook(hook)
+        for hook in postprocessor_hooks:
+            ydl.add_postprocessor_hook(hook)
+        for hook in post_hooks:
+            ydl.add_post_hook(hook)
+
+    def reset(self):
+        """Drop everything a job changed, keeping connections and cookies."""
+        ydl = self.ydl
+        ydl.params.clear()
+        ydl.params.update(copy.deepcopy(self.params))
+        for attr, hooks in self.hooks.items():
+            if hasattr(ydl, attr):
+                getattr(ydl, attr)[:] = hooks
+        for pp, hooks in self.pp_hooks:
+            pp._progress_hooks[:] = hooks
+        # Jobs may swap in a planned format selector
+        ydl.format_selector = self.format_selector
+        ydl._download_retcode = 0
+
+class YDLPool:
+    """Thread-safe pool of YoutubeDL instances, one idle list per profile.
+
+    A profile name stands for one fixed set of options (e.g. 'info',
+    'video', 'audio'). Checkout never blocks: if no idle instance exists a
+    new one is built, and at most `max_idle` instances per profile are kept
+    for reuse.
+    """
+
+    def __init__(self, max_idle=4):
+        self.max_idle = max_idle
+        self.created = 0
+        self.reused = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, profile, options):
+        with self._lock:
+            idle = self._idle.setdefault(profile, [])
+            if idle:
+                self.reused += 1
+                return idle.pop()
+            self.created += 1
+
+        import yt_dlp
+
+        return _PooledYDL(yt_dlp.YoutubeDL(copy.deepcopy(options)))
+
+    def _release(self, profile, pooled):
+        try:
+            pooled.reset()
+        except Exception:
+            pooled.ydl.close()
+            return
+        with self._lock:
+            idle = self._idle.setdefault(profile, [])
+            if len(idle) < self.max_idle:
+                idle.append(pooled)
+                return
+        pooled.ydl.close()
+
+    @contextmanager
+    def checkout(self, profile, options, outtmpl=None, progress_hooks=(), postprocessor_hooks=(), post_hooks=()):
+        """Borrow a YoutubeDL configured with `options` for one job.
+
+        The per-job output template and hooks are applied on checkout and
+        removed again when the instance is returned.
+        """
+        pooled = self._acquire(profile, options)
+        try:
+            pooled.prepare(outtmpl, progress_hooks, postprocessor_hooks, post_hooks)
+            yield pooled.ydl
+        finally:
+            self._release(profile, pooled)
+
+    def close(self):
+        """Close every idle instance (saving cookies and closing connections)."""
+        with self._lock:
+            idle = [pooled for pool in self._idle.values() for pooled in pool]
+            self._idle.clear()
+        for pooled in idle:
+            pooled.ydl.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'created': self.created,
+                'reused': self.reused,
+                'idle': {profile: len(pool) for profile, pool in self._idle.items()},
+            }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_ydl_pool():
+    """Process-wide YoutubeDL pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = YDLPool()
+        return _pool
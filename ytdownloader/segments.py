@@ -0,0 +1,67 @@
+"""Parsing clip segment lists and chapters."""
+
+import csv
+import io
+import json
+import re
+
+def parse_time_to_seconds(time_str):
+    """Convert SS, MM:SS or HH:MM:SS (seconds may be fractional) to seconds."""
+    try:
+        seconds = 0.0
+        for part in str(time_str).strip().split(':'):
+            seconds = seconds * 60 + float(part)
+        return int(seconds) if seconds == int(seconds) else seconds
+    except ValueError:
+        return 0
+
+def _segment(start, end, title=None):
+    start = parse_time_to_seconds(start) if isinstance(start, str) else start
+    end = parse_time_to_seconds(end) if isinstance(end, str) else end
+    return {'start': start, 'end': end, 'title': title or ''}
+
+def parse_segments(text):
+    """Parse a list of clip segments.
+
+    Accepts a JSON list of {start, end, title} objects (start_time/end_time
+    as in yt-dlp chapters also work), CSV with a start,end[,title] header,
+    or one "start-end [title]" per line. Times use the same formats as
+    parse_time_to_seconds.
+    """
+    text = text.strip()
+    if not text:
+        return []
+
+    if text.startswith('['):
+        segments = []
+        for item in json.loads(text):
+            start = item.get('start', item.get('start_time'))
+            end = item.get('end', item.get('end_time'))
+            segments.append(_segment(start, end, item.get('title')))
+        return [seg for seg in segments if seg['end'] > seg['start']]
+
+    first_line = text.splitlines()[0].lower()
+    if ',' in first_line and 'start' in first_line:
+        segments = []
+        for row in csv.DictReader(io.StringIO(text)):
+            row = {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+            start = row.get('start') or row.get('start_time')
+            end = row.get('end') or row.get('end_time')
+            if start and end:
+                segments.append(_segment(start, end, row.get('title')))
+        return [seg for seg in segments if seg['end'] > seg['start']]
+
+    segments = []
+    for line in text.splitlines():
+        match = re.match(r'\s*([\d:.]+)\s*(?:-|–|\s)\s*([\d:.]+)\s*(.*)', line)
+        if match:
+            segments.append(_segment(match.group(1), match.group(2), match.group(3).strip()))
+    return [seg for seg in segments if seg['end'] > seg['start']]
+
+def chapters_to_segments(info):
+    """Turn the chapters of an info dict into clip segments."""
+    return [
+        _segment(chapter['start_time'], chapter['end_time'], chapter.get('title'))
+        for chapter in info.get('chapters') or []
+        if chapter.get('end_time') is not None
+    ]
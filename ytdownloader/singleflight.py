@@ -0,0 +1,54 @@
+"""Coalescing of identical concurrent calls ("single flight")."""
+
+import threading
+from concurrent.futures import Future
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its result.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is running wait for it and receive the same result or
+    exception. Progress callbacks of every caller are fed from the leader's
+    run.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, progress_callback=None):
+        """Run fn(progress_callback) once for all concurrent callers with this key."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'future': Future(), 'callbacks': []}
+                self._calls[key] = call
+            if progress_callback:
+                call['callbacks'].append(progress_callback)
+
+        if not leader:
+            return call['future'].result()
+
+        def fan_out(event):
+            with self._lock:
+                callbacks = list(call['callbacks'])
+            for callback in callbacks:
+                callback(event)
+
+        try:
+            result = fn(fan_out)
+        except BaseException as e:
+            call['future'].set_exception(e)
+            raise
+        else:
+            call['future'].set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self, key):
+        """True while a call with this key is running."""
+        with self._lock:
+            return key in self._calls
@@ -0,0 +1,271 @@
+"""Streaming delivery of videos and clips over HTTP, without output files.
+
+ffmpeg writes fragmented MP4 (or MP3) to a pipe and the pipe is relayed
+to the client as a chunked HTTP response. Only one read buffer is held
+per stream: while the client is slow, the pipe fills up and ffmpeg
+blocks, so a stream never buffers more than the pipe plus one chunk.
+
+    python -m ytdownloader serve --port 8765
+    GET /stream?url=...&start=90&end=120[&audio=1[&mp3=1]][&max_height=720]
+    GET /metrics    (Prometheus text format, see metrics.py)
+"""
+
+import logging
+import os
+import subprocess
+import threading
+import time
+from contextlib import ExitStack
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlencode, urlparse
+
+from .cache import get_source_cache
+from .download import (
+    RANGE_FETCH_PROTOCOLS, build_range_fetch_command, get_selected_formats, resolve_info, ydl_options,
+)
+from .metrics import get_metrics, record_phase
+from .pool import get_ydl_pool
+from .segments import parse_time_to_seconds
+from .trim import MP3_ENCODE_ARGS, audio_extension
+from .urls import clean_youtube_url, extract_video_id
+from .utils import safe_filename
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from ffmpeg (and written to the client) at a time
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Fragmented MP4: the header goes out at once and every keyframe starts a
+# fragment the client can receive without the file being finished
+FRAGMENTED_MP4_ARGS = ['-f', 'mp4', '-movflags', 'frag_keyframe+empty_moov+default_base_moof']
+
+CONTENT_TYPES = {
+    'mp4': 'video/mp4',
+    'm4a': 'audio/mp4',
+    'mp3': 'audio/mpeg',
+}
+
+def _stream_output(audio_only, audio_format, acodec):
+    """Return (extension, ffmpeg output args) for a streamed file."""
+    if audio_only and audio_format == 'mp3':
+        return 'mp3', MP3_ENCODE_ARGS + ['-f', 'mp3']
+    if audio_only:
+        # Fragmented MP4 holds AAC and Opus alike
+        extension = 'm4a' if audio_extension(acodec) == 'm4a' else 'mp4'
+        return extension, ['-c', 'copy'] + FRAGMENTED_MP4_ARGS
+    return 'mp4', ['-c', 'copy'] + FRAGMENTED_MP4_ARGS
+
+class PipeStream:
+    """Iterator over the stdout of a running ffmpeg, in chunks.
+
+    ffmpeg is started right away, so its first fragment is being produced
+    while the response headers go out. close() stops ffmpeg and releases
+    whatever the stream held (e.g. a source cache lock).
+    """
+
+    def __init__(self, cmd, cleanup=None, chunk_size=STREAM_CHUNK_SIZE, method=None):
+        self.chunk_size = chunk_size
+        self.method = method
+        self.bytes_sent = 0
+        self.first_byte = None
+        self._started = time.monotonic()
+        self._cleanup = cleanup or ExitStack()
+        self._errors = []
+        self.process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE, bufsize=0)
+        # Drain stderr so a chatty ffmpeg never blocks on it
+        self._drain = threading.Thread(target=lambda: self._errors.append(self.process.stderr.read()),
+                                       daemon=True)
+        self._drain.start()
+
+    def __iter__(self):
+        while True:
+            chunk = self.process.stdout.read(self.chunk_size)
+            if not chunk:
+                break
+            if self.first_byte is None:
+                self.first_byte = time.monotonic() - self._started
+            self.bytes_sent += len(chunk)
+            yield chunk
+
+    def close(self):
+        process = self.process
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+        self._drain.join()
+        self._cleanup.close()
+        error = None
+        if process.returncode > 0 and self._errors and self._errors[0]:
+            error = self._errors[0].decode('utf-8', errors='replace').strip()
+            logger.warning("Streaming ffmpeg exited with %s: %s", process.returncode, error)
+        # A killed ffmpeg means the client stopped reading early
+        record_phase('stream', time.monotonic() - self._started, 'error' if error else 'ok',
+                     method=self.method, bytes=self.bytes_sent, first_byte=self.first_byte,
+                     complete=process.returncode == 0, error=error)
+
+def open_stream(url, start_time=None, end_time=None, audio_only=False, audio_format='native',
+                max_height=None, chunk_size=STREAM_CHUNK_SIZE):
+    """Prepare a streamed download of a video, audio track or clip.
+
+    The clip is cut from the source cache if the source is there, otherwise
+    only the needed bytes are read from the format URLs; nothing is written
+    to disk either way. Cuts are stream copies, so a clip starts at the
+    keyframe before start_time (or is re-encoded to MP3 on request).
+
+    Returns (success, (filename, content type, PipeStream) or error
+    message). The stream must be closed when done; that stops ffmpeg.
+    """
+    video_id = extract_video_id(url)
+    if not video_id:
+        return False, "Not a YouTube video URL"
+    profile, ydl_opts = ydl_options(audio_only, audio_format=audio_format, raw_source=True)
+
+    try:
+        with get_ydl_pool().checkout(profile, ydl_opts) as ydl:
+            info, _ = resolve_info(ydl, clean_youtube_url(url), video_id, {
+                'audio_only': audio_only,
+                'audio_format': audio_format,
+                'max_height': max_height,
+            })
+    except Exception as e:
+        return False, f"Could not resolve video: {e}"
+
+    duration = info.get('duration') or 0
+    if start_time is None or end_time is None:
+        if not duration:
+            return False, "Unknown duration; give a start and end time"
+        start_time, end_time = 0, duration
+    if end_time <= start_time:
+        return False, "End time must be greater than start time"
+
+    cleanup = ExitStack()
+    source_cache = get_source_cache()
+    source_id = info.get('id') or video_id
+    source_format = info.get('format_id') or 'default'
+    # Lock before the lookup, so the source can't be evicted while it is
+    # streamed. Without waiting: while another job holds the lock to fetch
+    # the source, streaming from the format URLs starts right away.
+    locked = cleanup.enter_context(source_cache.lock(source_id, source_format, shared=True, blocking=False))
+    source_path = source_cache.get(source_id, source_format) if locked else None
+    if source_path:
+        formats = [dict(info, url=source_path, http_headers=None)]
+    else:
+        # Streamed from the format URLs; nothing to hold on to
+        cleanup.close()
+        formats = get_selected_formats(info)
+        if not formats or any(f.get('protocol', 'https') not in RANGE_FETCH_PROTOCOLS for f in formats):
+            return False, "Selected formats can't be streamed"
+
+    extension, output_args = _stream_output(audio_only, audio_format, info.get('acodec'))
+    cmd = build_range_fetch_command(formats, start_time, end_time, 'pipe:1', audio_only, output_args)
+    title = safe_filename(info.get('title', 'video'))
+    filename = f"{title}_clip.{extension}" if (start_time, end_time) != (0, duration) else f"{title}.{extension}"
+    try:
+        stream = PipeStream(cmd, cleanup, chunk_size, method='source_cache' if source_path else 'range_fetch')
+    except FileNotFoundError:
+        cleanup.close()
+        return False, "FFmpeg not found. Please install FFmpeg and add it to your PATH."
+    return True, (filename, CONTENT_TYPES.get(extension, 'application/octet-stream'), stream)
+
+def stream_query(url, start_time=None, end_time=None, audio_only=False, audio_format='native', max_height=None):
+    """Query string for a /stream request."""
+    params = {'url': url}
+    if start_time is not None and end_time is not None:
+        params.update(start=start_time, end=end_time)
+    if audio_only:
+        params['audio'] = 1
+        if audio_format == 'mp3':
+            params['mp3'] = 1
+    if max_height:
+        params['max_height'] = max_height
+    return urlencode(params)
+
+class StreamHandler(BaseHTTPRequestHandler):
+    """GET /stream?url=... answered with a chunked, streamed file; GET /metrics with the metrics."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+    def _error(self, status, message):
+        body = message.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        request = urlparse(self.path)
+        if request.path == '/metrics':
+            body = get_metrics().render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if request.path != '/stream':
+            self._error(404, "Not found")
+            return
+        query = {key: values[0] for key, values in parse_qs(request.query).items()}
+        if not query.get('url'):
+            self._error(400, "Missing url parameter")
+            return
+        try:
+            start_time = parse_time_to_seconds(query['start']) if 'start' in query else None
+            end_time = parse_time_to_seconds(query['end']) if 'end' in query else None
+            max_height = int(query['max_height']) if query.get('max_height') else None
+        except ValueError:
+            self._error(400, "Invalid start, end or max_height")
+            return
+
+        success, result = open_stream(
+            query['url'], start_time, end_time,
+            audio_only=query.get('audio') == '1',
+            audio_format='mp3' if query.get('mp3') == '1' else 'native',
+            max_height=max_height,
+        )
+        if not success:
+            self._error(422, result)
+            return
+
+        filename, content_type, stream = result
+        try:
+            self._send_stream(filename, content_type, stream)
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away; closing the stream stops ffmpeg
+            self.close_connection = True
+        finally:
+            stream.close()
+
+    def _send_stream(self, filename, content_type, stream):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Disposition', f"attachment; filename*=UTF-8''{quote(filename)}")
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        # Writes block while the client is slow; ffmpeg then blocks on the full pipe
+        for chunk in stream:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+        self.wfile.write(b"0\r\n\r\n")
+
+def make_stream_server(host='127.0.0.1', port=8765):
+    """HTTP server for streamed downloads; call serve_forever() to run it."""
+    server = ThreadingHTTPServer((host, port), StreamHandler)
+    server.daemon_threads = True
+    return server
+
+def start_stream_server(host=None, port=None):
+    """Run the stream server in a background thread; return it.
+
+    host and port default to YTDL_STREAM_HOST and YTDL_STREAM_PORT.
+    """
+    host = host or os.environ.get('YTDL_STREAM_HOST', '127.0.0.1')
+    port = int(port or os.environ.get('YTDL_STREAM_PORT', 8765))
+    server = make_stream_server(host, port)
+    threading.Thread(target=server.serve_forever, name="stream-server", daemon=True).start()
+    return server
@@ -0,0 +1,551 @@
+"""Trimming and clip extraction with ffmpeg."""
+
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from .metrics import phase
+from .utils import get_downloads_folder, output_suffix, safe_filename
+
+logger = logging.getLogger(__name__)
+
+# Encoders used to rebuild partial GOPs so they can be concatenated with the
+# stream-copied middle of a clip. HEVC is left out: its keyframes are
+# usually open-GOP (CRA), whose leading pictures are lost when cutting there.
+SMART_CUT_ENCODERS = {
+    'h264': 'libx264',
+}
+
+# Bitstream filters that put a copied stream's parameter sets in-band, and
+# the MP4 sample entries that allow parameter sets inside the stream
+ANNEXB_FILTERS = {
+    'h264': 'h264_mp4toannexb',
+}
+IN_BAND_TAGS = {
+    'h264': 'avc3',
+}
+
+X264_PROFILES = {
+    'baseline': 'baseline',
+    'constrained baseline': 'baseline',
+    'main': 'main',
+    'high': 'high',
+}
+
+# Containers that hold each audio codec without re-encoding (ffprobe codec
+# names and yt-dlp acodec prefixes)
+AUDIO_CONTAINERS = {
+    'aac': 'm4a',
+    'mp4a': 'm4a',
+    'opus': 'opus',
+    'vorbis': 'ogg',
+    'mp3': 'mp3',
+    'flac': 'flac',
+}
+
+# Encoder options used when MP3 output is explicitly requested
+MP3_ENCODE_ARGS = ['-c:a', 'libmp3lame', '-b:a', '320k']
+
+# Encoder options of the full re-encode fallback (single and chunked)
+REENCODE_VIDEO_ARGS = ['-c:v', 'libx264', '-preset', 'fast', '-crf', '23']
+REENCODE_AUDIO_ARGS = ['-c:a', 'aac']
+
+# Chunked re-encoding: libx264 threads per chunk, and the shortest chunk
+# worth a separate encoder (shorter clips are encoded in one go)
+CHUNK_ENCODE_THREADS = 2
+MIN_CHUNK_SECONDS = 15
+
+def audio_extension(codec):
+    """File extension that stores an audio codec as-is."""
+    codec = (codec or '').lower()
+    for prefix, extension in AUDIO_CONTAINERS.items():
+        if codec.startswith(prefix):
+            return extension
+    return 'mka'
+
+def probe_streams(input_path):
+    """Return the stream list reported by ffprobe for a media file."""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'stream=index,codec_type,codec_name,profile,pix_fmt,width,height,r_frame_rate,time_base',
+        '-of', 'json',
+        input_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        return []
+    return json.loads(result.stdout or '{}').get('streams', [])
+
+def probe_packets(input_path, start_time, end_time, margin=10):
+    """Return sorted (pts_time, is_keyframe) of the first video stream's packets around a time range.
+
+    Only packet headers in [start_time - margin, end_time + margin] are read,
+    so the cost does not depend on the length of the file.
+    """
+    interval = f"{max(start_time - margin, 0)}%{end_time + margin}"
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-read_intervals', interval,
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=p=0',
+        input_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        return []
+
+    packets = {}
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(',')
+        try:
+            pts = float(pts_time)
+        except ValueError:
+            continue  # pts_time can be N/A
+        packets[pts] = packets.get(pts, False) or 'K' in flags
+    return sorted(packets.items())
+
+def probe_keyframes(input_path, start_time, end_time, margin=10):
+    """Return the sorted keyframe timestamps of the first video stream around a time range."""
+    return [pts for pts, key in probe_packets(input_path, start_time, end_time, margin) if key]
+
+def _half_frame(video_stream):
+    """Half a frame duration of a video stream in seconds (0 if the rate is unknown).
+
+    Parts end this much before the next part's start, so rounding never
+    puts a boundary frame into both parts.
+    """
+    num, _, den = (video_stream.get('r_frame_rate') or '').partition('/')
+    if num.isdigit() and den.isdigit() and int(num):
+        return int(den) / int(num) / 2
+    return 0
+
+def _encode_args(video_stream, param_set_id):
+    """Encoder options that reproduce the source stream's parameters.
+
+    param_set_id numbers the part's SPS/PPS (x264 only), so they don't
+    replace the source's parameter sets of the same number.
+    """
+    args = ['-c:v', SMART_CUT_ENCODERS[video_stream['codec_name']], '-preset', 'fast', '-crf', '18']
+    if video_stream.get('pix_fmt'):
+        args += ['-pix_fmt', video_stream['pix_fmt']]
+    profile = X264_PROFILES.get((video_stream.get('profile') or '').lower())
+    if profile and video_stream['codec_name'] == 'h264':
+        args += ['-profile:v', profile]
+    if video_stream['codec_name'] == 'h264':
+        args += ['-x264-params', f"sps-id={param_set_id}"]
+    if video_stream.get('r_frame_rate') and video_stream['r_frame_rate'] != '0/0':
+        args += ['-r', video_stream['r_frame_rate']]
+    return args
+
+def smart_cut(input_path, start_time, end_time, output_path):
+    """Frame-accurate trim that only re-encodes the partial GOPs at each end.
+
+    The GOP-aligned middle of the clip is stream-copied; the head (start to
+    first keyframe) and tail (last keyframe to end) are re-encoded with the
+    source codec settings, and the parts are joined with the concat demuxer.
+    Audio is stream-copied for the whole range. CPU time is bounded by two
+    GOPs regardless of clip length.
+
+    The re-encoded parts never come out with exactly the source encoder's
+    codec parameters, so every part carries its own parameter sets
+    in-band at its keyframes and the output is tagged for that (avc3)
+    instead of relying on the single set in the container header. The
+    edges number their parameter sets apart from the source's.
+
+    Returns output_path on success, None if the source can't be smart-cut.
+    """
+    streams = probe_streams(input_path)
+    video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    if not video or video.get('codec_name') not in SMART_CUT_ENCODERS:
+        return None
+
+    packets = probe_packets(input_path, start_time, end_time)
+    inner = [pts for pts, key in packets if key and start_time <= pts <= end_time]
+    epsilon = 0.01
+
+    timescale_args = []
+    time_base = video.get('time_base', '')
+    if time_base.startswith('1/'):
+        # Keep every part on the same timescale so concat can copy them
+        timescale_args = ['-video_track_timescale', time_base[2:]]
+
+    with tempfile.TemporaryDirectory(prefix="smartcut_") as work_dir:
+        # (start, end, copy?) for each part of the clip
+        if inner:
+            first_key, last_key = inner[0], inner[-1]
+            sections = []
+            if first_key - start_time > epsilon:
+                sections.append((start_time, first_key, False))
+            if last_key - first_key > epsilon:
+                sections.append((first_key, last_key, True))
+            if end_time - last_key > epsilon:
+                sections.append((last_key, end_time, False))
+        else:
+            # The whole range sits inside one GOP
+            sections = [(start_time, end_time, False)]
+
+        guard = _half_frame(video)
+        part_paths = []
+        for i, (part_start, part_end, copy_part) in enumerate(sections):
+            if i < len(sections) - 1:
+                part_end -= guard
+            part_path = os.path.join(work_dir, f"part{i}.mp4")
+            part_paths.append(part_path)
+            cmd = [
+                'ffmpeg', '-hide_banner', '-loglevel', 'error',
+                '-ss', str(part_start),
+                '-i', input_path,
+                '-t', str(part_end - part_start),
+                '-map', '0:v:0', '-an',
+            ]
+            if copy_part:
+                # With stream copy -t can let frames past the next keyframe
+                # through; a frame count ends the part exactly on the GOP
+                frames = sum(1 for pts, _ in packets if part_start - epsilon < pts < part_end)
+                cmd += ['-frames:v', str(frames), '-c:v', 'copy', '-avoid_negative_ts', 'make_zero',
+                        '-bsf:v', ANNEXB_FILTERS[video['codec_name']]]
+            else:
+                # The highest IDs (31 is the limit), clear of the source's
+                # (0 for every common encoder) and of each other
+                cmd += _encode_args(video, 30 if i == 0 else 31) + ['-bsf:v', 'dump_extra=freq=keyframe']
+            cmd += timescale_args + ['-y', part_path]
+
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0 or not os.path.exists(part_path):
+                return None
+
+        list_path = os.path.join(work_dir, "parts.txt")
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for part_path in part_paths:
+                f.write(f"file '{part_path}'\n")
+
+        # Join the video parts and copy the matching audio range in one pass
+        cmd = [
+            'ffmpeg', '-hide_banner', '-loglevel', 'error',
+            '-f', 'concat', '-safe', '0', '-i', list_path,
+            '-ss', str(start_time), '-t', str(end_time - start_time), '-i', input_path,
+            '-map', '0:v:0', '-map', '1:a:0?',
+            '-c', 'copy',
+            '-tag:v', IN_BAND_TAGS[video['codec_name']],
+            '-movflags', '+faststart',
+            '-y',
+            output_path
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0 or not os.path.exists(output_path):
+            return None
+    return output_path
+
+def available_cpus():
+    """Number of cores this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+def _chunk_bounds(keyframes, start_time, end_time, chunks):
+    """Split [start_time, end_time] at keyframes into at most `chunks` similar parts."""
+    target = (end_time - start_time) / chunks
+    bounds = [start_time]
+    for key in keyframes:
+        if key - bounds[-1] >= target and end_time - key >= MIN_CHUNK_SECONDS:
+            bounds.append(key)
+    bounds.append(end_time)
+    return list(zip(bounds, bounds[1:]))
+
+def parallel_reencode(input_path, start_time, end_time, output_path, workers=None):
+    """Re-encode a clip in keyframe-aligned chunks on all cores.
+
+    The clip range is split at source keyframes (so every chunk seeks
+    straight to a decodable frame), the chunks are encoded side by side by
+    separate ffmpeg processes with the same libx264 settings as the single
+    re-encode, the audio range is encoded once alongside them, and the
+    results are joined with the concat demuxer without another encode.
+
+    Returns output_path, or None when the clip is too short to be worth
+    splitting or a step failed (the caller then encodes it in one go).
+    """
+    cpus = available_cpus()
+    workers = workers or max(1, cpus // CHUNK_ENCODE_THREADS)
+    chunks = min(workers, int((end_time - start_time) // MIN_CHUNK_SECONDS))
+    if chunks < 2:
+        return None
+
+    streams = probe_streams(input_path)
+    video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    if not video:
+        return None
+    has_audio = any(s.get('codec_type') == 'audio' for s in streams)
+    keyframes = [k for k in probe_keyframes(input_path, start_time, end_time, margin=0)
+                 if start_time < k < end_time]
+    bounds = _chunk_bounds(keyframes, start_time, end_time, chunks)
+    if len(bounds) < 2:
+        return None
+
+    timescale_args = []
+    time_base = video.get('time_base', '')
+    if time_base.startswith('1/'):
+        # Same timescale in every chunk so concat can copy them
+        timescale_args = ['-video_track_timescale', time_base[2:]]
+    threads = str(max(1, cpus // min(workers, len(bounds))))
+    # Stop each chunk half a frame before the next keyframe
+    guard = _half_frame(video)
+
+    with tempfile.TemporaryDirectory(prefix="reencode_") as work_dir:
+        jobs = []
+        part_paths = []
+        for i, (part_start, part_end) in enumerate(bounds):
+            part_path = os.path.join(work_dir, f"part{i}.mp4")
+            part_paths.append(part_path)
+            if i < len(bounds) - 1:
+                part_end -= guard
+            jobs.append(['ffmpeg', '-hide_banner', '-loglevel', 'error',
+                         '-ss', str(part_start), '-i', input_path, '-t', str(part_end - part_start),
+                         '-map', '0:v:0', '-an'] + REENCODE_VIDEO_ARGS +
+                        ['-threads', threads] + timescale_args + ['-y', part_path])
+        audio_path = os.path.join(work_dir, "audio.m4a")
+        if has_audio:
+            jobs.append(['ffmpeg', '-hide_banner', '-loglevel', 'error',
+                         '-ss', str(start_time), '-i', input_path, '-t', str(end_time - start_time),
+                         '-map', '0:a:0', '-vn'] + REENCODE_AUDIO_ARGS + ['-y', audio_path])
+
+        with ThreadPoolExecutor(max_workers=min(workers, len(jobs)), thread_name_prefix="encode") as executor:
+            results = list(executor.map(lambda cmd: subprocess.run(cmd, capture_output=True, text=True), jobs))
+        for result in results:
+            if result.returncode != 0:
+                logger.warning("Chunk encode failed: %s", result.stderr.strip())
+                return None
+
+        list_path = os.path.join(work_dir, "parts.txt")
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for part_path in part_paths:
+                f.write(f"file '{part_path}'\n")
+
+        cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', list_path]
+        if has_audio:
+            cmd += ['-i', audio_path, '-map', '0:v:0', '-map', '1:a:0']
+        cmd += ['-c', 'copy', '-y', output_path]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0 or not os.path.exists(output_path):
+            logger.warning("Joining encoded chunks failed: %s", result.stderr.strip())
+            return None
+    return output_path
+
+def reencode(input_path, start_time, end_time, output_path):
+    """Re-encode a clip in a single ffmpeg run; return output_path or None."""
+    cmd = [
+        'ffmpeg',
+        '-ss', str(start_time),
+        '-i', input_path,
+        '-t', str(end_time - start_time),
+    ]
+    # Re-encode video and audio to avoid keyframe issues
+    cmd += REENCODE_VIDEO_ARGS + REENCODE_AUDIO_ARGS
+    cmd += [
+        '-y',
+        output_path
+    ]
+
+    result = subprocess.run(cmd, capture_output=True, text=True)
+
+    if result.returncode == 0 and os.path.exists(output_path):
+        return output_path
+    logger.error("Re-encoding error: %s", result.stderr)
+    logger.error("Command used: %s", ' '.join(cmd))
+    return None
+
+def trim_video(input_path, start_time, end_time, video_title, output_folder=None, progress_callback=None,
+               name_suffix=None):
+    """Trim video using ffmpeg.
+
+    Uses smart_cut (stream copy plus re-encoding of the partial GOPs at the
+    edges); only falls back to re-encoding the whole clip when the source
+    can't be smart-cut, in parallel chunks when the clip is long enough.
+    progress_callback, if given, receives a 'trim' phase event naming the
+    method used.
+
+    The clip is named '<title>_clip<name_suffix>.mp4'; name_suffix defaults
+    to the trim range, so different clips of one video don't overwrite
+    each other.
+    """
+    with phase('trim', clip_seconds=end_time - start_time) as span:
+        def report(method):
+            # The span ends up with the method that produced the clip
+            span['method'] = method
+            span['attempts'] = span.get('attempts', 0) + 1
+            if progress_callback:
+                progress_callback({'phase': 'trim', 'method': method})
+
+        output_path = _trim_video(input_path, start_time, end_time, video_title, output_folder, report, span,
+                                  name_suffix)
+        if output_path:
+            span['bytes'] = os.path.getsize(output_path)
+        else:
+            span['outcome'] = 'error'
+        return output_path
+
+def _trim_video(input_path, start_time, end_time, video_title, output_folder, report, span, name_suffix):
+    """Body of trim_video; report(method) is called before each attempt."""
+    try:
+        # Create output filename
+        output_folder = output_folder or get_downloads_folder()
+        
+        # Clean filename for filesystem
+        safe_title = safe_filename(video_title)
+        if name_suffix is None:
+            name_suffix = output_suffix(start_time, end_time)
+        output_filename = f"{safe_title}_clip{name_suffix}.mp4"
+        output_path = os.path.join(output_folder, output_filename)
+        
+        # Debug: Show the paths being used
+        logger.info("Trimming %s -> %s", input_path, output_path)
+
+        report('smart_cut')
+        if smart_cut(input_path, start_time, end_time, output_path):
+            return output_path
+
+        logger.warning("Smart cut not possible for %s, re-encoding the clip", input_path)
+        report('reencode')
+        if parallel_reencode(input_path, start_time, end_time, output_path):
+            span['method'] = 'parallel_reencode'
+            return output_path
+
+        # Re-encode the whole clip to avoid keyframe issues
+        return reencode(input_path, start_time, end_time, output_path)
+            
+    except FileNotFoundError:
+        logger.error("FFmpeg not found. Please install FFmpeg and add it to your PATH.")
+        return None
+    except Exception as e:
+        logger.error("Error trimming video: %s", e)
+        return None
+
+def trim_audio(input_path, start_time, end_time, title, output_folder=None, to_mp3=False, name_suffix=None):
+    """Trim an audio track by stream copy, keeping its native codec.
+
+    Audio frames are short (about 20 ms for AAC/Opus) and every packet is a
+    sync point, so seeking with stream copy is already frame-accurate. Only
+    an explicit MP3 request re-encodes. name_suffix is appended to the file
+    name as in trim_video.
+
+    Returns the output path, or None on failure.
+    """
+    output_folder = output_folder or get_downloads_folder()
+    if to_mp3:
+        extension = 'mp3'
+    else:
+        audio = next((s for s in probe_streams(input_path) if s.get('codec_type') == 'audio'), None)
+        extension = audio_extension(audio.get('codec_name') if audio else None)
+    if name_suffix is None:
+        name_suffix = output_suffix(start_time, end_time)
+    output_path = os.path.join(output_folder, f"{safe_filename(title)}_clip{name_suffix}.{extension}")
+
+    cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error',
+        '-ss', str(start_time),
+        '-i', input_path,
+        '-t', str(end_time - start_time),
+        '-map', '0:a:0', '-vn',
+    ]
+    cmd += MP3_ENCODE_ARGS if to_mp3 else ['-c:a', 'copy']
+    cmd += ['-y', output_path]
+
+    with phase('trim', method='mp3' if to_mp3 else 'audio_copy', attempts=1,
+               clip_seconds=end_time - start_time) as span:
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True)
+        except FileNotFoundError:
+            logger.error("FFmpeg not found. Please install FFmpeg and add it to your PATH.")
+            span.update(outcome='error', error="ffmpeg not found")
+            return None
+        if result.returncode == 0 and os.path.exists(output_path):
+            span['bytes'] = os.path.getsize(output_path)
+            return output_path
+        logger.error("Audio trim error: %s", result.stderr)
+        span.update(outcome='error', error=result.stderr.strip()[-500:])
+        return None
+
+def _clip_paths(segments, output_folder, video_title):
+    safe_title = safe_filename(video_title, max_length=60)
+    paths = []
+    for i, segment in enumerate(segments, 1):
+        label = safe_filename(segment['title'], max_length=40) if segment['title'] else ''
+        name = f"{safe_title}_{i:02d}" + (f"_{label}" if label else "") + ".mp4"
+        paths.append(os.path.join(output_folder, name))
+    return paths
+
+def _copy_clips(input_path, segments, output_paths, batch_size=32):
+    """Stream-copy many segments with one ffmpeg process per batch.
+
+    Each segment gets its own seeking demuxer on the shared input, so ffmpeg
+    only reads the parts of the file the clips cover.
+    """
+    for offset in range(0, len(segments), batch_size):
+        batch = list(zip(segments, output_paths))[offset:offset + batch_size]
+        cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error']
+        for segment, _ in batch:
+            cmd += ['-ss', str(segment['start']), '-t', str(segment['end'] - segment['start']), '-i', input_path]
+        for i, (_, output_path) in enumerate(batch):
+            cmd += [
+                '-map', f'{i}:v:0?', '-map', f'{i}:a:0?',
+                '-c', 'copy',
+                '-avoid_negative_ts', 'make_zero',
+                '-y', output_path
+            ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            return False, f"FFmpeg error: {result.stderr.strip()}"
+    return True, None
+
+def _accurate_clip(input_path, segment, output_path):
+    """Frame-accurate clip: smart cut, or a full re-encode of the segment."""
+    if smart_cut(input_path, segment['start'], segment['end'], output_path):
+        return output_path
+    return reencode(input_path, segment['start'], segment['end'], output_path)
+
+def extract_clips(input_path, segments, video_title, output_folder, accurate=False, max_workers=None,
+                  zip_output=False):
+    """Cut many clips out of one local source.
+
+    By default all clips are stream-copied by a single ffmpeg process that
+    reads the source once. With accurate=True each clip is smart-cut for
+    frame accuracy, in parallel over the shared file. Optionally the clips
+    are collected into a zip archive (which replaces the individual files).
+
+    Returns (success, list of clip paths or zip path, or an error message).
+    """
+    if not segments:
+        return False, "No segments given"
+    os.makedirs(output_folder, exist_ok=True)
+    output_paths = _clip_paths(segments, output_folder, video_title)
+
+    try:
+        if accurate:
+            workers = max_workers or os.cpu_count() or 1
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="clip") as executor:
+                results = list(executor.map(
+                    lambda args: _accurate_clip(input_path, *args), zip(segments, output_paths)
+                ))
+            if not all(results):
+                return False, f"{results.count(None)} of {len(results)} clips failed"
+        else:
+            success, error = _copy_clips(input_path, segments, output_paths)
+            if not success:
+                return False, error
+    except FileNotFoundError:
+        return False, "FFmpeg not found. Please install FFmpeg and add it to your PATH."
+
+    if zip_output:
+        zip_path = os.path.join(output_folder, f"{safe_filename(video_title, max_length=60)}_clips.zip")
+        # Video is already compressed; storing avoids burning CPU on deflate
+        with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for path in output_paths:
+                archive.write(path, os.path.basename(path))
+        for path in output_paths:
+            os.remove(path)
+        return True, zip_path
+    return True, output_paths
@@ -0,0 +1,33 @@
+"""YouTube URL parsing."""
+
+import re
+
+YOUTUBE_ID_PATTERNS = [
+    r'(?:https?://)?(?:www\.)?youtube\.com/watch\?v=([a-zA-Z0-9_-]{11})',
+    r'(?:https?://)?(?:www\.)?youtu\.be/([a-zA-Z0-9_-]{11})',
+    r'(?:https?://)?(?:www\.)?youtube\.com/embed/([a-zA-Z0-9_-]{11})',
+]
+
+def extract_video_id(url):
+    """Return the 11-character YouTube video ID in a URL, or None."""
+    # Remove extra parameters that might cause issues
+    if '&' in url:
+        url = url.split('&')[0]
+
+    for pattern in YOUTUBE_ID_PATTERNS:
+        match = re.search(pattern, url)
+        if match:
+            return match.group(1)
+    return None
+
+def clean_youtube_url(url):
+    """Clean and validate YouTube URL."""
+    # Ensure it's a valid YouTube URL
+    video_id = extract_video_id(url)
+    if video_id:
+        return f"https://www.youtube.com/watch?v={video_id}"
+
+    # Remove extra parameters that might cause issues
+    if '&' in url:
+        url = url.split('&')[0]
+    return url  # Return original if no pattern matches
@@ -0,0 +1,59 @@
+"""Filesystem helpers shared by the downloader modules."""
+
+import os
+from pathlib import Path
+
+def get_downloads_folder():
+    """Get the Downloads folder path for the current user."""
+    home = Path.home()
+    downloads_folder = home / "Downloads"
+    return str(downloads_folder)
+
+def get_cache_folder():
+    """Get the folder used for the app's persistent caches."""
+    base = os.environ.get('XDG_CACHE_HOME') or str(Path.home() / ".cache")
+    return os.path.join(base, "youtube_downloader")
+
+def safe_filename(title, max_length=100):
+    """Turn a video title into a filesystem-safe base filename."""
+    # Keep more characters but remove problematic ones
+    safe_title = "".join(c for c in title if c.isalnum() or c in "._- ").strip()
+    # Remove multiple spaces and replace with single space
+    safe_title = " ".join(safe_title.split())
+    # Limit filename length
+    if len(safe_title) > max_length:
+        safe_title = safe_title[:max_length]
+    return safe_title or "video"
+
+def seconds_label(seconds):
+    """Compact, normalised form of a time in seconds: 10, 10.0 and '10' all give '10'."""
+    return f"{float(seconds):.3f}".rstrip('0').rstrip('.')
+
+def output_suffix(start_time=None, end_time=None, max_height=None, max_bitrate=None):
+    """Filename suffix naming a request's quality caps and trim range, e.g. '_720p_10-20.5'."""
+    parts = []
+    if max_height:
+        parts.append(f"{max_height}p")
+    if max_bitrate:
+        parts.append(f"{max_bitrate}k")
+    if start_time is not None and end_time is not None:
+        parts.append(f"{seconds_label(start_time)}-{seconds_label(end_time)}")
+    return "".join(f"_{part}" for part in parts)
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file."""
+    import hashlib
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def format_bytes(num):
+    """Human-readable byte count."""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(num) < 1024:
+            return f"{num:.1f} {unit}"
+        num /= 1024
+    return f"{num:.1f} TB"